@@ -0,0 +1,87 @@
+"""benchmarks.bench_geometry -- microbenchmark for `vitamins.geometry.Vec3`.
+
+Compares the slotted `Vec3` against the old `__dict__`-based implementation (copied
+below as `DictVec3`), reporting nanoseconds per operation and bytes per instance. Run
+it from the repository root:
+
+.. sourcecode:: bash
+
+    python -m benchmarks.bench_geometry
+"""
+import sys
+import timeit
+
+from vitamins.geometry import Vec3
+
+
+class DictVec3:
+    """The `Vec3` constructor and operators as they were before `__slots__`."""
+
+    def __init__(self, x=0, y=0, z=0):
+        if hasattr(x, "x"):
+            self.x = float(x.x)
+            self.y = float(x.y) if hasattr(x, "y") else 0
+            self.z = float(x.z) if hasattr(x, "z") else 0
+        else:
+            self.x = float(x)
+            self.y = float(y)
+            self.z = float(z)
+
+    def __add__(self, other):
+        return DictVec3(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return DictVec3(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, scale):
+        return DictVec3(self.x * scale, self.y * scale, self.z * scale)
+
+    def cross(self, other):
+        return DictVec3(
+            self.y * other.z - self.z * other.y,
+            self.z * other.x - self.x * other.z,
+            self.x * other.y - self.y * other.x,
+        )
+
+
+# (name, statement for DictVec3, statement for Vec3)
+CASES = [
+    ("construct", "V(1.0, 2.0, 3.0)", "V(1.0, 2.0, 3.0)"),
+    ("copy", "V(a)", "V.from_vec(a)"),
+    ("add", "a + b", "a + b"),
+    ("sub", "a - b", "a - b"),
+    ("mul", "a * 2.0", "a * 2.0"),
+    ("cross", "a.cross(b)", "a.cross(b)"),
+    # DictVec3 has no `__iadd__`, so this measures its `c = c + b` fallback:
+    ("iadd", "c += b", "c += b"),
+]
+
+
+def instance_bytes(obj) -> int:
+    """Size of an instance, including its `__dict__` if it has one."""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def time_case(cls, stmt: str, number: int) -> float:
+    """Return the best-of-five time for `stmt`, in nanoseconds per operation."""
+    env = {"V": cls, "a": cls(1.0, 2.0, 3.0), "b": cls(4.0, 5.0, 6.0)}
+    timer = timeit.Timer(stmt, setup="c = V(0.0, 0.0, 0.0)", globals=env)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+
+def main(number: int = 200000):
+    print(f"{'case':>10} {'dict ns/op':>12} {'slots ns/op':>12} {'speedup':>8}")
+    for name, old_stmt, new_stmt in CASES:
+        old = time_case(DictVec3, old_stmt, number)
+        new = time_case(Vec3, new_stmt, number)
+        print(f"{name:>10} {old:12.1f} {new:12.1f} {old / new:7.2f}x")
+    old_size = instance_bytes(DictVec3(1.0, 2.0, 3.0))
+    new_size = instance_bytes(Vec3(1.0, 2.0, 3.0))
+    print(f"bytes per instance: dict {old_size}, slots {new_size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""benchmarks.harness -- timing, allocation measurement, and baseline comparison.
+
+A benchmark is a function that does any expensive setup and returns a zero-argument
+callable: the operation to measure. Register it with the `benchmark` decorator:
+
+.. sourcecode:: python
+
+    @benchmark("geometry")
+    def vec3_add():
+        a, b = Vec3(1, 2, 3), Vec3(4, 5, 6)
+        return lambda: a + b
+
+`run` measures each one and returns a results dict that can be saved as JSON. `compare`
+checks results against a saved baseline and lists the regressions.
+"""
+import fnmatch
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+Setup = Callable[[], Callable[[], object]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    group: str
+    setup: Setup
+
+
+REGISTRY: List[Benchmark] = []
+
+
+def benchmark(group: str, name: str = ""):
+    """Decorator that registers a setup function as a benchmark. The name defaults to
+    the function's name."""
+
+    def register(setup: Setup) -> Setup:
+        REGISTRY.append(Benchmark(name or setup.__name__, group, setup))
+        return setup
+
+    return register
+
+
+def time_op(op: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> float:
+    """Best-of-`repeat` time of `op`, in nanoseconds per call. Each repeat runs for
+    about `min_time` seconds."""
+    timer = timeit.Timer(op)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def measure_allocations(op: Callable[[], object], calls: int = 50) -> Dict[str, int]:
+    """Memory allocated by `op`, under `tracemalloc`:
+
+    * `alloc_bytes`: the peak memory in use during one call, above what was in use
+      before it (the least of several calls, so one-time caching doesn't count).
+    * `retained_bytes`: growth per call in the memory still in use, between `calls`
+      and `2 * calls` calls. Memory that is only replaced from call to call (like the
+      arrays of a `BallPredictor`) doesn't count, so anything above zero means the
+      operation keeps growing something.
+    """
+    op()  # warm up
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(5):
+            tracemalloc.clear_traces()
+            op()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak)
+        tracemalloc.clear_traces()
+        for _ in range(calls):
+            op()
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            op()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    retained = max(after - before, 0) // calls
+    return {"alloc_bytes": min(peaks), "retained_bytes": retained}
+
+
+def run(
+    benchmarks: List[Benchmark], patterns: List[str] = (), min_time: float = 0.2
+) -> Dict:
+    """Measure each benchmark whose name or group matches one of the glob `patterns`
+    (all of them, if there are none). A benchmark whose setup or operation raises is
+    reported with an `error` instead of numbers, and the rest still run."""
+    results = {}
+    for bench in benchmarks:
+        if patterns and not any(
+            fnmatch.fnmatch(bench.name, p) or fnmatch.fnmatch(bench.group, p)
+            for p in patterns
+        ):
+            continue
+        try:
+            op = bench.setup()
+            result = {"group": bench.group, "ns_per_op": time_op(op, min_time)}
+            result.update(measure_allocations(op))
+        except Exception as exc:
+            result = {"group": bench.group, "error": f"{type(exc).__name__}: {exc}"}
+        results[bench.name] = result
+        print(f"{bench.name:<40} {format_result(result)}", file=sys.stderr)
+    return {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def format_result(result: Dict) -> str:
+    if "error" in result:
+        return result["error"]
+    return (
+        f"{result['ns_per_op']:12.0f} ns/op {result['alloc_bytes']:8} B"
+        f" {result['retained_bytes']:6} B retained"
+    )
+
+
+class Regression(NamedTuple):
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self):
+        ratio = self.current / self.baseline if self.baseline else float("inf")
+        return (
+            f"{self.name}: {self.metric} {self.baseline:.0f} -> {self.current:.0f}"
+            f" ({ratio:.2f}x)"
+        )
+
+
+def compare(
+    current: Dict,
+    baseline: Dict,
+    threshold: float = 0.1,
+    thresholds: Optional[Dict[str, float]] = None,
+    alloc_slack: int = 64,
+) -> List[Regression]:
+    """Return the regressions in `current` results relative to `baseline`.
+
+    A benchmark's time regresses if it's more than `threshold` (a fraction) slower.
+    `thresholds` overrides that for particular benchmark names or groups (glob
+    patterns). Allocations regress if they grow by more than `alloc_slack` bytes and by
+    more than the threshold. Benchmarks missing from either side are ignored.
+    """
+    thresholds = thresholds or {}
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or "error" in before or "error" in now:
+            continue
+        limit = threshold
+        for pattern, value in thresholds.items():
+            if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(now["group"], pattern):
+                limit = value
+        if now["ns_per_op"] > before["ns_per_op"] * (1 + limit):
+            regressions.append(
+                Regression(name, "ns_per_op", before["ns_per_op"], now["ns_per_op"])
+            )
+        for metric in ("alloc_bytes", "retained_bytes"):
+            if now[metric] > max(
+                before[metric] * (1 + limit), before[metric] + alloc_slack
+            ):
+                regressions.append(
+                    Regression(name, metric, before[metric], now[metric])
+                )
+    return regressions
+
+
+def load(path: str) -> Dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def save(results: Dict, path: str):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
@@ -0,0 +1,317 @@
+"""benchmarks.suite -- microbenchmarks for the hot paths in `vitamins` and `ramen`.
+
+Each benchmark reports nanoseconds per operation, and the memory it allocates (see
+`benchmarks.harness`). Run the whole suite, or some of it, from the repository root:
+
+.. sourcecode:: bash
+
+    python -m benchmarks.suite                        # everything
+    python -m benchmarks.suite 'predictor*' geometry  # by name or group
+    python -m benchmarks.suite --out results.json     # save the results
+    python -m benchmarks.suite --save-baseline        # save as the baseline
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.15
+
+With `--baseline`, the exit status is 1 if anything regressed. Timings depend on the
+machine, so make the baseline on the machine you compare on.
+
+The match state comes from `vitamins.synthetic`: a few seconds of a made-up match,
+always the same, with the ball in play.
+"""
+import argparse
+import inspect
+import json
+import sys
+from typing import Callable, List
+
+from rlbot.utils.structures.ball_prediction_struct import BallPrediction
+from rlbot.utils.structures.game_data_struct import GameTickPacket
+
+from vitamins.draw import NullRenderer
+from vitamins.geometry import Orientation, Vec3
+from vitamins.match.match import Match
+from vitamins.match.prediction import BallPredictor
+from vitamins.math import Lerp
+from vitamins.synthetic import SyntheticMatch
+
+from ramen import control
+from ramen.agent import Agent
+from ramen.task import Task
+
+from benchmarks import harness
+from benchmarks.harness import benchmark
+
+_STREAM_TICKS = 240
+
+
+class _Stream:
+    """A repeating stream of `ticks` packets (and their ball predictions) from a
+    `SyntheticMatch`, copied up front so that generating them isn't timed. `next()`
+    returns the next packet, and makes its prediction the one that `prediction()`
+    returns. Other arguments go to `SyntheticMatch`."""
+
+    def __init__(self, num_cars: int, ticks: int = _STREAM_TICKS, **kwargs):
+        match = SyntheticMatch(num_cars, kickoff=False, **kwargs)
+        self.field_info = match.field_info
+        self.packets, self.predictions = zip(*match.snapshots(ticks))
+        self.index = -1
+
+    def next(self) -> GameTickPacket:
+        self.index = (self.index + 1) % len(self.packets)
+        return self.packets[self.index]
+
+    def prediction(self) -> BallPrediction:
+        return self.predictions[self.index]
+
+
+def _start_match(num_cars: int) -> _Stream:
+    """Set up `Match` as if an agent (car 0) had just played its first tick."""
+    stream = _Stream(num_cars)
+    agent = Agent("benchmark", 0, 0)
+    agent._set_renderer(NullRenderer())
+    agent._register_field_info(lambda: stream.field_info)
+    agent._register_ball_prediction_struct(stream.prediction)
+    Match.reset()
+    Match.initialize(agent, stream.next())
+    return stream
+
+
+# Geometry:
+
+
+@benchmark("geometry")
+def vec3_add():
+    a, b = Vec3(1, 2, 3), Vec3(4, 5, 6)
+    return lambda: a + b
+
+
+@benchmark("geometry")
+def vec3_scale():
+    a = Vec3(1, 2, 3)
+    return lambda: a * 2.5
+
+
+@benchmark("geometry")
+def vec3_dot():
+    a, b = Vec3(1, 2, 3), Vec3(4, 5, 6)
+    return lambda: a.dot(b)
+
+
+@benchmark("geometry")
+def vec3_cross():
+    a, b = Vec3(1, 2, 3), Vec3(4, 5, 6)
+    return lambda: a.cross(b)
+
+
+@benchmark("geometry")
+def vec3_normalized():
+    a = Vec3(1, 2, 3)
+    return lambda: a.normalized()
+
+
+@benchmark("geometry")
+def orientation_construct():
+    """Construction alone; the matrix is computed lazily."""
+    rotation = Vec3(0.3, 0.1, -0.2)
+    return lambda: Orientation(rotation)
+
+
+@benchmark("geometry")
+def orientation_forward():
+    """Construction plus the first use of the matrix."""
+    rotation = Vec3(0.3, 0.1, -0.2)
+    return lambda: Orientation(rotation).forward
+
+
+@benchmark("geometry")
+def hitbox_location():
+    _start_match(2)
+    hitbox = Match.agent_car.hitbox
+    return lambda: hitbox.location("FLU")
+
+
+# Ball prediction:
+
+
+def _predictor() -> BallPredictor:
+    stream = _Stream(2)
+    predictor = BallPredictor(stream.prediction)
+    predictor.update(stream.next())
+    return predictor
+
+
+@benchmark("predictor")
+def predictor_update():
+    """One tick's refresh, including on-goal analytics. The slices are 1/60 s apart,
+    so every other prediction starts half a slice off the last one."""
+    stream = _Stream(2)
+    predictor = BallPredictor(stream.prediction)
+    return lambda: predictor.update(stream.next())
+
+
+@benchmark("predictor")
+def predictor_update_continuation():
+    """The same, with one slice per tick, so each new prediction continues the last."""
+    stream = _Stream(2, slice_dt=1 / 120)
+    predictor = BallPredictor(stream.prediction)
+    return lambda: predictor.update(stream.next())
+
+
+@benchmark("predictor")
+def predictor_predict():
+    predictor = _predictor()
+    return lambda: predictor.predict(1.5)
+
+
+@benchmark("predictor")
+def predictor_predict_interpolated():
+    predictor = _predictor()
+    return lambda: predictor.predict(1.5, interpolate=True)
+
+
+@benchmark("predictor")
+def predictor_next_bounce():
+    predictor = _predictor()
+    return lambda: predictor.next_bounce()
+
+
+@benchmark("predictor")
+def predictor_next_ground():
+    predictor = _predictor()
+    return lambda: predictor.next_ground(z=300)
+
+
+# Control:
+
+
+@benchmark("control")
+def simulate_drive_forward():
+    return lambda: control.simulate_drive_forward(800, 1, 2500, 0, 30)
+
+
+@benchmark("control")
+def lerp_call():
+    lerp = Lerp([0.0, 500.0, 1000.0, 1500.0, 2000.0], [9, 4, 2, 1, 0.5], clamp=True)
+    return lambda: lerp(1234.5)
+
+
+# Match:
+
+
+def _match_update(num_cars: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        stream = _start_match(num_cars)
+        return lambda: Match.update(stream.next())
+
+    return setup
+
+
+# 64 is as many as a packet can hold, far more than a real match:
+for _num_cars in (2, 4, 8, 64):
+    benchmark("match", f"match_update_{_num_cars}")(_match_update(_num_cars))
+
+
+@benchmark("match")
+def field_update():
+    stream = _start_match(2)
+    return lambda: Match.field.update(stream.next())
+
+
+# MaruChamp task scores:
+
+
+def _task_classes() -> List[type]:
+    """Every `Task` defined by MaruChamp."""
+    import maruchamp_main
+    from maruchamp.tasks import kickoff
+
+    classes = []
+    for module in (maruchamp_main, kickoff):
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, Task) and cls.__module__ == module.__name__:
+                classes.append(cls)
+    return classes
+
+
+def _task_score(name: str) -> Callable[[], Callable[[], float]]:
+    def setup():
+        _start_match(2)
+        task = next(cls for cls in _task_classes() if cls.__name__ == name)()
+        return task.score
+
+    return setup
+
+
+# The task names are listed here, rather than found by importing maruchamp_main, so
+# that the rest of the suite runs even where the bot itself can't be imported:
+for _name in (
+    "BallChase",
+    "JustDrive",
+    "JustWiggle",
+    "BlockBall",
+    "WheelsDownRoll",
+    "NoseToFlatVelocity",
+    "PushBallToGoal",
+    "GetNearestBigBoost",
+    "StraightShotRollingBall",
+    "Reposition",
+    "BounceShot",
+    "GitYeeted",
+    "FlipAtBallKickoff",
+):
+    benchmark("tasks", f"score_{_name}")(_task_score(_name))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the hot-path microbenchmarks.")
+    parser.add_argument("patterns", nargs="*", help="benchmark names or groups (glob)")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument(
+        "--save-baseline",
+        nargs="?",
+        const="benchmarks/baseline.json",
+        help="save the results as the baseline (default: %(const)s)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed slowdown, as a fraction (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--threshold-for",
+        action="append",
+        default=[],
+        metavar="PATTERN=FRACTION",
+        help="allowed slowdown for matching benchmarks or groups",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="seconds per timing repeat"
+    )
+    args = parser.parse_args(argv)
+
+    results = harness.run(harness.REGISTRY, args.patterns, args.min_time)
+    if args.out:
+        harness.save(results, args.out)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.save_baseline:
+        harness.save(results, args.save_baseline)
+    if args.baseline:
+        thresholds = {}
+        for item in args.threshold_for:
+            pattern, _, value = item.partition("=")
+            thresholds[pattern] = float(value)
+        regressions = harness.compare(
+            results, harness.load(args.baseline), args.threshold, thresholds
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
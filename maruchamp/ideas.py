@@ -1,10 +1,12 @@
 from vitamins import draw
+from vitamins.cache import per_tick
 from vitamins.math import clamp, pi
 from vitamins.match.match import Match, Ball
 from vitamins.match.base import Location
 from vitamins.geometry import Vec3
 
 
+@per_tick()
 def desired_ball_direction(ball: Ball = None) -> Vec3:
     """Returns a normalized vector pointing the way we want the ball to go. On offense
     it'll be into the opponent's goal; on defense, it'll be away from ours."""
@@ -1,9 +1,11 @@
+from vitamins.cache import per_tick
 from vitamins.math import clamp
 from vitamins.geometry import Vec3
 from vitamins.match.base import Location
 from vitamins.match.match import Match
 
 
+@per_tick()
 def ball_on_wall_curve() -> float:
     ball = Match.ball
     field = Match.field
@@ -13,6 +15,7 @@ def ball_on_wall_curve() -> float:
     return clamp(1 - max(z_dist / 500, min(x_dist, y_dist) / 500), 0, 1)
 
 
+@per_tick()
 def ball_distance_advantage(max_distance: float = 1000) -> float:
     return 0.5 + clamp(
         Match.opponent_car.distance(Match.ball) - Match.agent_car.distance(Match.ball),
@@ -25,6 +28,7 @@ def ndot(v1: Vec3, v2: Vec3) -> float:
     return 0.5 + v1.ndot(v2) / 2
 
 
+@per_tick()
 def ball_rolling_on_ground() -> float:
     return clamp(
         1 - (Match.ball.z - Match.ball.radius) / 200 - abs(Match.ball.velocity.z) / 500,
@@ -33,6 +37,7 @@ def ball_rolling_on_ground() -> float:
     )
 
 
+@per_tick()
 def good_position(spot: Location) -> float:
     """Score how good it is to be in the given location."""
     score = 0
@@ -46,6 +51,7 @@ def good_position(spot: Location) -> float:
     return clamp(score, 0, 1)
 
 
+@per_tick()
 def high_ball() -> float:
     score = 0
     score += (Match.ball.z - Match.ball.radius) / 2000
@@ -53,6 +59,7 @@ def high_ball() -> float:
     return clamp(score, 0, 1)
 
 
+@per_tick()
 def rolling_into_corner() -> float:
     """Is the ball rolling into a corner (toward the goal)?"""
     ball = Match.ball
@@ -8,12 +8,14 @@ from maruchamp.actions.basic import FrontFlip
 
 class FlipAtBallKickoff(Task):
     flipped: bool = False
+    score_bound = 200
+    closed_score = -100
+
+    def gate(self):
+        return Match.ball.x == Match.ball.y == 0 and Match.ball.velocity.length() < 10
 
     def score(self):
-        if Match.ball.x == Match.ball.y == 0:
-            if Match.ball.velocity.length() < 10:
-                return 200
-        return -100
+        return 200
 
     def enter(self):
         self.flipped = False
@@ -3,10 +3,12 @@ from typing import List
 from vitamins import math, draw
 from vitamins.geometry import Vec3, Line
 from vitamins.match.match import Match, Ball
+from vitamins.match.base import Location
 from vitamins.match.field import BoostPickup
-from vitamins.util import TickStats, perf_counter_ns
+from vitamins.profiler import TickProfiler
 
 from ramen.agent import TaskAgent, Task
+from ramen.budget import FrameBudget
 from ramen.action import Action
 from ramen import control
 
@@ -26,8 +28,11 @@ class BallChase(Task):
 
 
 class JustDrive(Task):
+    def gate(self):
+        return Match.agent_car.has_wheel_contact
+
     def score(self):
-        return 1.0 if Match.agent_car.has_wheel_contact else 0.0
+        return 1.0
 
     def enter(self):
         self.do_action(driving.JustDrive())
@@ -39,8 +44,11 @@ class JustDrive(Task):
 class JustWiggle(Task):
     done = False
 
+    def gate(self):
+        return not self.done
+
     def score(self):
-        return 0 if self.done else 1
+        return 1
 
     def enter(self):
         self.do_action(driving.WiggleTurn(Match.ball, yaw_threshold=0))
@@ -79,18 +87,18 @@ class BlockBall(Task):
 class WheelsDownRoll(Task):
     """Get the wheels pointed down using roll only."""
 
-    def score(self):
+    def gate(self):
         if Match.agent_car.has_wheel_contact:
-            return 0
-        elif Match.time - Match.info.get("frontflip_time", 0) < 1.0:
-            return 0
-        else:
-            in_air = math.clamp((Match.agent_car.z - 50) / 50, 0, 1)
-            levelness = 1 - abs(Match.agent_car.forward.dot(Match.field.up))
-            need_roll = math.clamp(
-                10 * scores.ndot(Match.agent_car.up, Match.field.down), 0, 1
-            )
-            return min(in_air, levelness, need_roll)
+            return False
+        return Match.time - Match.info.get("frontflip_time", 0) >= 1.0
+
+    def score(self):
+        in_air = math.clamp((Match.agent_car.z - 50) / 50, 0, 1)
+        levelness = 1 - abs(Match.agent_car.forward.dot(Match.field.up))
+        need_roll = math.clamp(
+            10 * scores.ndot(Match.agent_car.up, Match.field.down), 0, 1
+        )
+        return min(in_air, levelness, need_roll)
 
     def enter(self):
         self.target_down = Match.field.down
@@ -124,15 +132,15 @@ class NoseToFlatVelocity(Task):
      using yaw and pitch.
      """
 
+    def gate(self):
+        if Match.agent_car.has_wheel_contact or Match.agent_car.speed < 0.1:
+            return False
+        return Match.time - Match.info.get("frontflip_time", 0) >= 1.0
+
     def score(self):
         flat_velocity = Match.agent_car.velocity.flat()
-        if Match.agent_car.has_wheel_contact or Match.agent_car.speed < 0.1:
-            return 0
-        elif Match.time - Match.info.get("frontflip_time", 0) < 1.0:
-            return 0
-        else:
-            in_air = math.clamp((Match.agent_car.z - 50) / 50, 0, 1)
-            return in_air * -scores.ndot(flat_velocity, Match.agent_car.forward)
+        in_air = math.clamp((Match.agent_car.z - 50) / 50, 0, 1)
+        return in_air * -scores.ndot(flat_velocity, Match.agent_car.forward)
 
     def enter(self):
         self.target_dot = 0.96
@@ -204,7 +212,11 @@ class PushBallToGoal(Task):
         )
         final_direction = (ideal_direction + touch_direction / 100).normalized()
         final_direction = touch_direction.normalized()
-        future_ball.position -= future_ball.radius * final_direction
+        # The predicted ball is shared for the tick, so offset a copy of it:
+        future_ball = Location(
+            future_ball.position - future_ball.radius * final_direction,
+            future_ball.velocity,
+        )
         if Match.agent_car.to(future_ball).dot(Match.agent_car.right) > 0.2:
             box_location = "FUR"
         elif Match.agent_car.to(future_ball).dot(Match.agent_car.right) < -0.2:
@@ -236,9 +248,19 @@ class PushBallToGoal(Task):
 
 
 class GetNearestBigBoost(Task):
+    refresh_ms = 100
+
+    def gate(self):
+        return Match.agent_car.boost < 100
+
+    @staticmethod
+    def nearest_pickup() -> BoostPickup:
+        index = Match.field.big_boost_locations.nearest_index(Match.agent_car)
+        return Match.field.big_boosts[index]
+
     def score(self):
         s = 0.3 + 0.4 * scores.high_ball()
-        self.boost_pickup: BoostPickup = Match.agent_car.nearest(Match.field.big_boosts)
+        self.boost_pickup = self.nearest_pickup()
         if self.boost_pickup.is_ready:
             s -= Match.agent_car.distance(self.boost_pickup) / 3000
             s -= (
@@ -257,11 +279,15 @@ class GetNearestBigBoost(Task):
         return math.clamp(min(s, 1 - Match.agent_car.boost / 100), 0, 1)
 
     def run(self):
+        if not self.gate():
+            return  # full; the agent switches tasks as soon as it can
+        # The score (and the pickup it chose) may be from an earlier tick:
+        self.boost_pickup = self.nearest_pickup()
         self.do_action(driving.DriveToLocation(target=self.boost_pickup))
 
     def monitor_action(self, action: Action):
         Match.agent.boost()
-        if not self.boost_pickup.is_ready:
+        if not self.boost_pickup.is_ready or Match.agent_car.boost >= 100:
             self.cancel_action()
 
 
@@ -269,6 +295,9 @@ class StraightShotRollingBall(Task):
     """If the ball is rolling at us and we're pointed toward it, and the direction
     isn't awful, then just ponk it."""
 
+    def gate(self):
+        return Match.agent_car.has_wheel_contact
+
     def score(self):
         score = scores.ndot(Match.ball.velocity, Match.agent_car.backward)
         score -= (
@@ -285,7 +314,6 @@ class StraightShotRollingBall(Task):
             2 * scores.ndot(Match.agent_car.to(Match.ball), Match.agent_car.forward)
             - 1,
         )
-        score = 0 if not Match.agent_car.has_wheel_contact else score
         return score
 
     def run(self):
@@ -296,6 +324,9 @@ class StraightShotRollingBall(Task):
 
 
 class Reposition(Task):
+    score_bound = 0.7
+    refresh_ticks = 8
+
     def score(self):
         s = 0.1 + 0.6 * scores.high_ball()
         return math.clamp(s, 0, 1)
@@ -323,8 +354,10 @@ class Reposition(Task):
 
 
 class BounceShot(Task):
+    tunables = Task.tunables + ("boost_threshold",)
     boost_threshold: float = 0.2
     bounce = None
+    refresh_ms = 50
 
     def score(self):
         self.bounce = (
@@ -341,7 +374,7 @@ class BounceShot(Task):
         self.status = f"Time to bounce: {self.bounce.time - Match.time:.2f}s"
         yaw = Match.agent_car.yaw_to(self.bounce)
         yaw_factor = math.clamp(1 - abs(yaw), 0, 1)
-        ftime, fdist, fspeed, fboost = control.simulate_drive_forward(
+        ftime = control.drive_time(
             speed=Match.agent_car.forward_speed,
             throttle=1,
             boost=Match.agent_car.boost,
@@ -362,7 +395,7 @@ class BounceShot(Task):
         Match.agent.clear_controls()
         control.steer_to(self.bounce)
         dt = self.bounce.time - Match.time
-        ftime, fdist, fspeed, fboost = control.simulate_drive_forward(
+        ftime = control.drive_time(
             speed=Match.agent_car.forward_speed,
             throttle=0,
             boost=0,
@@ -372,7 +405,7 @@ class BounceShot(Task):
             # Even coasting we'll get there too early, hit the brakes:
             Match.agent.throttle(-1)
             return
-        ftime, fdist, fspeed, fboost = control.simulate_drive_forward(
+        ftime = control.drive_time(
             speed=Match.agent_car.forward_speed,
             throttle=1,
             boost=0,
@@ -393,34 +426,30 @@ class BounceShot(Task):
 class GitYeeted(Task):
     """Demo the opponent."""
 
-    def score(self):
+    def gate(self):
         if Match.current_prediction.on_goal[Match.agent.team]:
-            return 0
-        elif not Match.agent_car.has_wheel_contact or Match.agent_car.z > 50:
-            return 0
-        else:
-            yaw = Match.agent_car.yaw_to(Match.opponent_car)
-            yaw_factor = math.clamp(1 - abs(yaw), 0, 1)
-            boost_needed = (2300 - Match.agent_car.speed) * 33.3 / 900
-            boost_factor = math.clamp((Match.agent_car.boost - boost_needed) / 20, 0, 1)
-            dist_factor = math.clamp(
-                1 - Match.agent_car.distance(Match.opponent_car) / 2000, 0, 1
-            )
-            evasion_factor = math.clamp(Match.opponent_car.speed / 1500, 0, 1)
-            on_goal_factor = (
-                3 if Match.current_prediction.on_goal[1 - Match.agent.team] else 1
-            )
-            speed_factor = math.clamp(
-                (Match.agent_car.forward_speed - 1400) / 100, 0, 1
-            )
-            return math.clamp(
-                on_goal_factor
-                * min(
-                    yaw_factor, boost_factor, dist_factor, evasion_factor, speed_factor
-                ),
-                0,
-                1,
-            )
+            return False
+        return Match.agent_car.has_wheel_contact and Match.agent_car.z <= 50
+
+    def score(self):
+        yaw = Match.agent_car.yaw_to(Match.opponent_car)
+        yaw_factor = math.clamp(1 - abs(yaw), 0, 1)
+        boost_needed = (2300 - Match.agent_car.speed) * 33.3 / 900
+        boost_factor = math.clamp((Match.agent_car.boost - boost_needed) / 20, 0, 1)
+        dist_factor = math.clamp(
+            1 - Match.agent_car.distance(Match.opponent_car) / 2000, 0, 1
+        )
+        evasion_factor = math.clamp(Match.opponent_car.speed / 1500, 0, 1)
+        on_goal_factor = (
+            3 if Match.current_prediction.on_goal[1 - Match.agent.team] else 1
+        )
+        speed_factor = math.clamp((Match.agent_car.forward_speed - 1400) / 100, 0, 1)
+        return math.clamp(
+            on_goal_factor
+            * min(yaw_factor, boost_factor, dist_factor, evasion_factor, speed_factor),
+            0,
+            1,
+        )
 
     def run(self):
         Match.agent.throttle(1)
@@ -464,8 +493,8 @@ class MaruChamp(TaskAgent):
         self.last_score_time: float = 0
 
     def start_stats(self):
-        interval = 1000
-        self.stat_tick_ms = TickStats("tick", "ms", interval=interval, startup=300)
+        Match.profiler = TickProfiler(startup=300)
+        self.budget = FrameBudget()
 
     def setup_tasks(self):
         self.add_task(FlipAtBallKickoff())
@@ -512,18 +541,18 @@ class MaruChamp(TaskAgent):
         task_y = y
         task_x = x + width + 5
         dy = 20
-        for pair in self.tasks[:33]:
-            score = round(100 * math.clamp(self.weighted_score(pair), 0, 1))
+        for task, weighted_score in self.ranked_tasks()[:33]:
+            score = round(100 * math.clamp(weighted_score, 0, 1))
             ylevel = (100 - score) * height / 100
             task_y = max(task_y, y + ylevel)
-            if pair[0] is self.current_task:
+            if task is self.current_task:
                 if self.current_task.busy():
                     color = "pink"
                 else:
                     color = "cyan"
             else:
                 color = "white"
-            draw.text(task_x, task_y, 1, f"--[{score:3}]--{pair[0]}", color=color)
+            draw.text(task_x, task_y, 1, f"--[{score:3}]--{task}", color=color)
             task_y += dy
 
     def debug(self):
@@ -551,7 +580,6 @@ class MaruChamp(TaskAgent):
         Match.ball.is_rolling()
 
     def every_tick(self):
-        self.tick_start = perf_counter_ns()
         # self.clear_controls()
         if len(self.tasks) == 1:
             self.setup_tasks()
@@ -559,8 +587,6 @@ class MaruChamp(TaskAgent):
         # self.debug()
         # Match.draw_prediction()
         # draw.cross(Match.current_prediction.next_bounce())
-        tick_ms = (perf_counter_ns() - self.tick_start) / 1e6
-        self.stat_tick_ms.update(tick_ms)
 
     def boost(self, value: bool = True):
         value = value and Match.agent_car.speed < 2300
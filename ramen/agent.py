@@ -1,7 +1,7 @@
 """ramen.agent -- Base class for Agents."""
 from functools import wraps
-from operator import methodcaller
-from typing import Callable, List, Tuple
+from operator import itemgetter, methodcaller
+from typing import Callable, List, Optional, Tuple
 
 from rlbot.agents.base_agent import BaseAgent, SimpleControllerState
 from rlbot.utils.structures.game_data_struct import GameTickPacket
@@ -12,12 +12,24 @@ from vitamins.match.match import Match
 from vitamins.match.car import Car
 from vitamins.match.ball import Ball
 from vitamins.match.field import Field
-from vitamins.math import clamp, copysign
+from vitamins.math import clamp, copysign, inf
+from vitamins.util import perf_counter_ns
 
+from ramen.budget import FrameBudget, allows
 from ramen.task import Task
+from ramen.tuning import TuningServer
+
+_GOLDEN_RATIO = 0.6180339887  # spreads task refresh phases evenly
 
 
 class Agent(BaseAgent):
+    # Set to a `FrameBudget` to skip optional work when a tick runs long:
+    budget: Optional[FrameBudget] = None
+    # Set to a `TuningServer` to take tuning requests between ticks:
+    tuning: Optional[TuningServer] = None
+    # Attributes that the `TuningServer` may change:
+    tunables: Tuple[str, ...] = ()
+
     def __init__(self, name, team, index):
         super().__init__(name, team, index)
         self.controls = SimpleControllerState()
@@ -36,6 +48,15 @@ class Agent(BaseAgent):
         self.controls.use_item = False
 
     def get_output(self, packet: GameTickPacket) -> SimpleControllerState:
+        if self.tuning is not None:
+            self.tuning.process(self)
+        profiler = Match.profiler
+        if profiler is not None:
+            profiler.begin_tick()
+        budget = self.budget
+        if budget is not None:
+            budget.begin_tick()
+            draw.resume()
         self.renderer.begin_rendering()
 
         if self.tick == 0:
@@ -43,7 +64,13 @@ class Agent(BaseAgent):
             Match.initialize(self, packet)
             self.first_tick()
 
-        Match.update(packet)
+        analytics = allows(budget, "analytics")
+        if profiler is None:
+            Match.update(packet, analytics)
+        else:
+            start = perf_counter_ns()
+            Match.update(packet, analytics)
+            profiler.since("match_update", start)
 
         # Call kickoff_begin at the start of a kickoff:
         if packet.game_info.is_kickoff_pause:
@@ -57,12 +84,37 @@ class Agent(BaseAgent):
         self.every_tick()
 
         self.tick += 1
-        self.renderer.end_rendering()
+        if profiler is None:
+            if self.can_render():
+                self.render()
+            self.renderer.end_rendering()
+        else:
+            start = perf_counter_ns()
+            if self.can_render():
+                self.render()
+            self.renderer.end_rendering()
+            profiler.since("render", start)
+            profiler.end_tick()
+        if budget is not None:
+            budget.end_tick()
         return self.controls
 
+    def can_render(self) -> bool:
+        """Return True if the frame budget leaves time for drawing. If not, `draw` calls
+        are ignored for the rest of the tick."""
+        if allows(self.budget, "render"):
+            return True
+        draw.suspend()
+        return False
+
     def every_tick(self):
         pass
 
+    def render(self):
+        """Called every tick after `every_tick`. Put debug drawing here, so the profiler
+        can tell it apart from the actual work."""
+        pass
+
     def kickoff_begin(self):
         pass
 
@@ -122,7 +174,10 @@ class Agent(BaseAgent):
 
 class TaskAgent(Agent):
     tasks: List[Tuple[Task, float]]
+    tunables = ("task_switch_threshold", "refresh_margin")
     task_switch_threshold: float = 0.05
+    # Tasks with a cached score within this much of taking over are always rescored:
+    refresh_margin: float = 0.1
 
     def __init__(self, name, team, index):
         super().__init__(name, team, index)
@@ -130,9 +185,20 @@ class TaskAgent(Agent):
         self.current_task = None
         self.current_score: float = -1
         self.current_weight: float = 0
+        # Weighted scores from the last time the tasks were scored, in task order. Tasks
+        # skipped because they couldn't win are None:
+        self.task_scores: List[Optional[float]] = []
+        # Last score of each task, and when it was computed (tick and match time), for
+        # tasks that refresh less often than every tick:
+        self._last_scores: List[Optional[float]] = []
+        self._scored_ticks: List[int] = []
+        self._scored_times: List[float] = []
 
     def add_task(self, task: Task, weight: float = 1):
         self.tasks.append((task, weight))
+        self._last_scores.append(None)
+        self._scored_ticks.append(0)
+        self._scored_times.append(0.0)
 
     def switch_task(self, new_task: Task):
         if self.current_task is not None:
@@ -145,6 +211,12 @@ class TaskAgent(Agent):
     @staticmethod
     def weighted_score(pair: Tuple[Task, float]) -> float:
         task, weight = pair
+        if not task.gate():
+            return task.closed_score * weight
+        return TaskAgent._ungated_score(task, weight)
+
+    @staticmethod
+    def _ungated_score(task: Task, weight: float) -> float:
         try:
             result = task.score() * weight
         except TypeError as exc:
@@ -152,26 +224,141 @@ class TaskAgent(Agent):
             return 0
         return result
 
+    def _score_task(self, i: int, bar: float, force: bool = False) -> float:
+        """Weighted score of task `i`. The gate is checked every time, but the score
+        itself is reused until the task's refresh interval is up, unless `force` is
+        set or the last score was within `refresh_margin` of `bar`."""
+        task, weight = self.tasks[i]
+        if not task.gate():
+            self._last_scores[i] = None
+            return task.closed_score * weight
+        last = self._last_scores[i]
+        if last is not None and not force and last < bar - self.refresh_margin:
+            if (
+                self.tick - self._scored_ticks[i] < task.refresh_ticks
+                or Match.time - self._scored_times[i] < task.refresh_ms / 1000
+            ):
+                return last
+        profiler = Match.profiler
+        if profiler is None:
+            score = self._ungated_score(task, weight)
+        else:
+            start = perf_counter_ns()
+            score = self._ungated_score(task, weight)
+            profiler.since(f"score:{task.name or type(task).__name__}", start)
+        if last is None:
+            # Start each task at a different point in its interval, so tasks with the
+            # same refresh rate don't all come due on the same tick:
+            phase = (i * _GOLDEN_RATIO) % 1
+            self._scored_ticks[i] = self.tick - int(phase * task.refresh_ticks)
+            self._scored_times[i] = Match.time - phase * task.refresh_ms / 1000
+        else:
+            self._scored_ticks[i] = self.tick
+            self._scored_times[i] = Match.time
+        self._last_scores[i] = score
+        return score
+
+    @staticmethod
+    def _weighted_bound(task: Task, weight: float) -> float:
+        if not task.enabled:
+            return -inf
+        if weight == 0:
+            return 0.0  # not inf * 0, which is nan
+        return task.score_bound * weight
+
+    def score_tasks(self, rescore: bool = True) -> Optional[int]:
+        """Score the tasks, at most once each, keeping the results in `task_scores` for
+        the rest of the tick. Return the index of the best task that was scored, or
+        None if none were.
+
+        The current task is always scored. The rest go in order of their weighted
+        `score_bound`, stopping at the first one that couldn't both beat the best score
+        so far and reach the current score plus the switch threshold. Tasks with a
+        `refresh_ticks` or `refresh_ms` interval may report their last score instead.
+        If `rescore` is False and there is a current task, only it is scored, and the
+        others keep their last scores.
+        """
+        scores: List[Optional[float]] = [None] * len(self.tasks)
+        best, best_score = None, -inf
+        bar = self.current_score + self.task_switch_threshold
+        for i, pair in enumerate(self.tasks):
+            if pair[0] is self.current_task and pair[0].enabled:
+                best, best_score = i, self._score_task(i, bar, force=True)
+                scores[i] = self.current_score = best_score
+                bar = best_score + self.task_switch_threshold
+                break
+        if not rescore and best is not None:
+            self.task_scores = [
+                score if score is not None else last
+                for score, last in zip(scores, self._last_scores)
+            ]
+            return best
+        bounds = [self._weighted_bound(task, weight) for task, weight in self.tasks]
+        for i in sorted(range(len(bounds)), key=bounds.__getitem__, reverse=True):
+            # A score equal to the bar is enough to switch (see `every_tick`):
+            if bounds[i] < bar or bounds[i] <= best_score:
+                break
+            if scores[i] is None:
+                scores[i] = self._score_task(i, bar)
+                if scores[i] > best_score:
+                    best, best_score = i, scores[i]
+        self.task_scores = scores
+        return best
+
+    def ranked_tasks(self) -> List[Tuple[Task, float]]:
+        """Return (task, weighted score) pairs from the last scoring, best first,
+        leaving out tasks that weren't scored. This doesn't call any score functions."""
+        scored = zip((task for task, _ in self.tasks), self.task_scores)
+        scored = [pair for pair in scored if pair[1] is not None]
+        return sorted(scored, key=itemgetter(1), reverse=True)
+
     def kickoff_begin(self):
         self.current_task = None
         self.current_score = -1
+        self._last_scores = [None] * len(self.tasks)
 
     def every_tick(self):
         if self.current_task is not None and self.current_task.busy():
             # Task can't be interrupted right now:
-            self.current_task()
+            self.run_current_task()
         else:
+            if self.current_task is not None and not self.current_task.enabled:
+                self.current_task.leave()
+                self.current_task.action = None
+                self.current_task = None
+                self.current_score = -1
             if self.tasks:
-                self.tasks.sort(key=self.weighted_score, reverse=True)
-                if (
-                    self.weighted_score(self.tasks[0])
-                    >= self.current_score + self.task_switch_threshold
-                ):
-                    self.switch_task(self.tasks[0][0])
-                    self.current_weight = self.tasks[0][1]
+                self.can_render()
+                rescore = allows(self.budget, "rescoring")
+                profiler = Match.profiler
+                if profiler is None:
+                    best = self.score_tasks(rescore)
+                else:
+                    start = perf_counter_ns()
+                    best = self.score_tasks(rescore)
+                    profiler.since("scoring", start)
+                if best is not None:
+                    best_task, best_weight = self.tasks[best]
+                    best_score = self.task_scores[best]
+                    if (
+                        best_task is not self.current_task
+                        and best_score
+                        >= self.current_score + self.task_switch_threshold
+                    ):
+                        self.switch_task(best_task)
+                        self.current_weight = best_weight
+                        self.current_score = best_score
                 if self.current_task is not None:
-                    self.current_task()
-                    self.current_score = self.current_task.score() * self.current_weight
+                    self.run_current_task()
+
+    def run_current_task(self):
+        self.can_render()
+        if Match.profiler is None:
+            self.current_task()
+        else:
+            start = perf_counter_ns()
+            self.current_task()
+            Match.profiler.since("run", start)
 
 
 class SimpleAgent1v1(Agent):
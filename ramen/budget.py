@@ -0,0 +1,107 @@
+"""ramen.budget -- keeping each tick inside its frame budget.
+
+If `get_output` takes longer than a frame, RLBot just reuses the previous controls, so a
+slow tick is a dropped frame. Give an agent a `FrameBudget` and it keeps track of the
+time spent so far in each tick, and drops optional work as the deadline gets close:
+
+1. `render`: debug drawing, both the agent's `render` and any `draw` calls from tasks.
+2. `analytics`: values derived from the ball prediction, like on-goal detection.
+3. `rescoring`: scoring tasks other than the current one (no task switches that tick).
+
+Each level kicks in once the given fraction of the budget is used up, and a level that
+kicks in takes the ones before it with it.
+
+.. sourcecode:: python
+
+    from ramen.budget import FrameBudget
+
+    class MyAgent(TaskAgent):
+        def __init__(self, name, team, index):
+            super().__init__(name, team, index)
+            self.budget = FrameBudget()
+
+`stats()` reports how often each level was triggered.
+"""
+from typing import Dict, Optional, Set
+
+from vitamins.util import perf_counter_ns
+
+LEVELS = ("render", "analytics", "rescoring")
+
+
+class FrameBudget:
+    """Tracks the time spent in the current tick, against a deadline.
+
+    A tick that runs over leaves the next one less time, since it started late: the
+    overrun (up to one whole budget) is carried over as debt.
+
+    :param budget_ms: Time available per tick.
+    :param render: Fraction of the budget after which rendering is skipped.
+    :param analytics: Fraction after which prediction analytics are skipped.
+    :param rescoring: Fraction after which only the current task is scored.
+    """
+
+    def __init__(
+        self,
+        budget_ms: float = 1000 / 120,
+        render: float = 0.5,
+        analytics: float = 0.6,
+        rescoring: float = 0.75,
+    ):
+        self.budget_ns = budget_ms * 1e6
+        self.thresholds: Dict[str, float] = {
+            "render": render,
+            "analytics": analytics,
+            "rescoring": rescoring,
+        }
+        self.ticks = 0
+        self.overruns = 0
+        self.triggered: Dict[str, int] = dict.fromkeys(LEVELS, 0)
+        self._start = 0
+        self._debt = 0
+        self._shed: Set[str] = set()
+
+    def begin_tick(self):
+        self._start = perf_counter_ns() - self._debt
+        self._shed.clear()
+
+    def end_tick(self):
+        elapsed = perf_counter_ns() - self._start
+        self.ticks += 1
+        for level in self._shed:
+            self.triggered[level] += 1
+        if elapsed > self.budget_ns:
+            self.overruns += 1
+            self._debt = min(elapsed - self.budget_ns, self.budget_ns)
+        else:
+            self._debt = 0
+
+    def used(self) -> float:
+        """Fraction of this tick's budget used so far, including any debt."""
+        return (perf_counter_ns() - self._start) / self.budget_ns
+
+    def allow(self, level: str) -> bool:
+        """Return True if there's still time for the optional work at `level` this
+        tick. Once a level is refused, it stays refused until the next tick."""
+        if level in self._shed:
+            return False
+        if self.used() < self.thresholds[level]:
+            return True
+        self._shed.update(LEVELS[: LEVELS.index(level) + 1])
+        return False
+
+    def stats(self) -> Dict[str, float]:
+        """Counts of ticks, overruns, and ticks on which each level was triggered, and
+        the same as fractions of all ticks."""
+        result = {"ticks": self.ticks, "overruns": self.overruns}
+        result.update(self.triggered)
+        ticks = max(self.ticks, 1)
+        result["overrun_rate"] = self.overruns / ticks
+        for level, count in self.triggered.items():
+            result[f"{level}_rate"] = count / ticks
+        return result
+
+
+def allows(budget: Optional[FrameBudget], level: str) -> bool:
+    """`budget.allow(level)`, or True if there's no budget."""
+    return budget is None or budget.allow(level)
@@ -0,0 +1,167 @@
+"""ramen.headless -- run an agent offline, from a recording, with no game running.
+
+`HeadlessRunner` creates an agent and feeds it the packets from a `vitamins.recorder`
+recording, tick by tick, as fast as it will go. The renderer is a `NullRenderer`, and
+the field info and ball prediction come from the recording, so the agent's whole
+decision stack runs just as it would in a match, and its controller outputs can be
+collected for benchmarking or regression testing.
+
+From the command line, this writes one JSON line per tick:
+
+.. sourcecode:: bash
+
+    python -m ramen.headless match.vrec --agent maruchamp_main:MaruChamp --out run.jsonl
+
+The recording must include the field info and the ball prediction (see `Recorder`).
+
+By default the run is deterministic: anything that depends on the wall clock or on
+outside input is switched off, so the same agent on the same recording always gives
+the same outputs, however busy the machine is. That means the agent's `FrameBudget`
+(which would otherwise shed work when a tick runs long) and its `TuningServer`. Pass
+`--wall-clock` to keep them.
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple, Type
+
+from rlbot.agents.base_agent import SimpleControllerState
+from rlbot.utils.structures.game_data_struct import FieldInfoPacket
+
+from vitamins.draw import NullRenderer
+from vitamins.match.match import Match
+from vitamins.recorder import Recording
+
+from ramen.agent import Agent
+
+CONTROLS = (
+    "throttle",
+    "steer",
+    "pitch",
+    "yaw",
+    "roll",
+    "jump",
+    "boost",
+    "handbrake",
+    "use_item",
+)
+
+
+class TickOutput(NamedTuple):
+    """What the agent did on one tick."""
+
+    tick: int
+    time: float
+    controls: Tuple
+    task: str  # current task (with its action) for a TaskAgent, or ""
+
+    def as_dict(self) -> Dict:
+        return {
+            "tick": self.tick,
+            "time": self.time,
+            "controls": dict(zip(CONTROLS, self.controls)),
+            "task": self.task,
+        }
+
+
+class HeadlessRunner:
+    """Drives an agent from a recording.
+
+    :param agent_class: Any `Agent` subclass.
+    :param recording: The recording to play.
+    :param index: Index of the agent's car in the recorded packets.
+    :param field_info: Used instead of the recording's field info, if given.
+    :param deterministic: If True, the agent's `budget` and `tuning` are removed
+        before every tick (see the module docs).
+    """
+
+    def __init__(
+        self,
+        agent_class: Type[Agent],
+        recording: Recording,
+        index: int = 0,
+        field_info: Optional[FieldInfoPacket] = None,
+        deterministic: bool = True,
+    ):
+        self.recording = recording
+        self.deterministic = deterministic
+        self.field_info = field_info or recording.field_info
+        if self.field_info is None:
+            raise ValueError("The recording has no field info, and none was given")
+        packet, self.prediction = recording.read(0)
+        team = packet.game_cars[index].team
+        Match.reset()
+        self.agent = agent_class(f"headless{index}", team, index)
+        self.agent._set_renderer(NullRenderer())
+        self.agent._register_field_info(lambda: self.field_info)
+        self.agent._register_ball_prediction_struct(lambda: self.prediction)
+
+    def step(self, index: int) -> SimpleControllerState:
+        """Run the agent on record number `index`, and return its controls. (The
+        agent reuses the controls object, so it changes on the next step.)"""
+        packet, self.prediction = self.recording.read(index)
+        if self.deterministic:
+            # Checked every tick, since an agent may set these up at any point:
+            self.agent.budget = None
+            self.agent.tuning = None
+        return self.agent.get_output(packet)
+
+    def run(self, start: int = 0, stop: Optional[int] = None) -> Iterator[TickOutput]:
+        """Run the agent through the recording, yielding its output for each tick."""
+        stop = len(self.recording) if stop is None else min(stop, len(self.recording))
+        for index in range(start, stop):
+            controls = self.step(index)
+            task = getattr(self.agent, "current_task", None)
+            yield TickOutput(
+                tick=index,
+                time=float(self.recording.times[index]),
+                controls=tuple(getattr(controls, name) for name in CONTROLS),
+                task="" if task is None else str(task),
+            )
+
+
+def load_agent_class(spec: str) -> Type[Agent]:
+    """Import an agent class given as "module:ClassName"."""
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="file written by vitamins.recorder")
+    parser.add_argument("--agent", required=True, help="module:ClassName")
+    parser.add_argument("--index", type=int, default=0, help="the agent's car index")
+    parser.add_argument("--start", type=int, default=0, help="first record")
+    parser.add_argument("--stop", type=int, default=None, help="last record + 1")
+    parser.add_argument("--out", help="JSON lines output (default: stdout)")
+    parser.add_argument(
+        "--wall-clock",
+        action="store_true",
+        help="keep the agent's frame budget and tuning server (not deterministic)",
+    )
+    args = parser.parse_args(argv)
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    with Recording(args.recording) as recording:
+        runner = HeadlessRunner(
+            load_agent_class(args.agent),
+            recording,
+            args.index,
+            deterministic=not args.wall_clock,
+        )
+        ticks = 0
+        started = time.perf_counter()
+        for output in runner.run(args.start, args.stop):
+            out.write(json.dumps(output.as_dict()) + "\n")
+            ticks += 1
+        elapsed = time.perf_counter() - started
+    if out is not sys.stdout:
+        out.close()
+    rate = ticks / elapsed if elapsed else 0
+    print(f"{ticks} ticks in {elapsed:.2f}s ({rate:.0f} ticks/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""ramen.replay_diff -- check that two versions of an agent make the same decisions.
+
+After optimizing something the agent depends on, replay some recordings through the
+agent before and after, and compare the controller outputs tick by tick. Each side is
+a `Build`: a source tree (such as a `git worktree` of the commit before the change)
+and the agent class to load from it. The two sides can be the same tree with different
+agent classes, to compare configurations.
+
+.. sourcecode:: bash
+
+    git worktree add ../before HEAD~1
+    python -m ramen.replay_diff recordings/*.vrec --agent maruchamp_main:MaruChamp \\
+        --base ../before --head . --tolerance steer=0.001 --tolerance throttle=0.001
+
+Every recording is run through both builds by `ramen.headless`, each in its own
+process, as many at a time as there are cores. The runs are deterministic (frame
+budgets are off), so running builds in parallel doesn't change the outputs. For each
+recording, the first tick on which any control differs by more than its tolerance is
+reported, along with the task each build was running (with its action chain). The exit
+status is 1 if any recording diverged. Both trees need `ramen.headless`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from ramen.headless import CONTROLS
+
+DEFAULT_TOLERANCE = 1e-6
+
+
+class Build(NamedTuple):
+    """One side of the comparison."""
+
+    name: str
+    tree: str  # root of the source tree
+    agent: str  # "module:ClassName"
+    python: str = sys.executable
+
+
+class Divergence(NamedTuple):
+    tick: int
+    time: float
+    control: str  # name of the first control that differs, or "length"
+    base_value: object
+    head_value: object
+    base_task: str
+    head_task: str
+
+    def __str__(self):
+        return (
+            f"tick {self.tick} (t={self.time:.3f}): {self.control} "
+            f"{self.base_value!r} != {self.head_value!r}\n"
+            f"    base: {self.base_task}\n"
+            f"    head: {self.head_task}"
+        )
+
+
+class Result(NamedTuple):
+    recording: str
+    ticks: int
+    divergence: Optional[Divergence] = None
+    error: str = ""
+
+    def __str__(self):
+        if self.error:
+            return f"{self.recording}: ERROR {self.error}"
+        if self.divergence is None:
+            return f"{self.recording}: same ({self.ticks} ticks)"
+        return f"{self.recording}: diverged at {self.divergence}"
+
+
+def run_build(build: Build, recording: str, index: int, out: str):
+    """Run `recording` through the agent of `build`, writing its outputs to `out`."""
+    env = dict(os.environ)
+    tree = os.path.abspath(build.tree)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [tree, env.get("PYTHONPATH")]))
+    command = [build.python, "-m", "ramen.headless", os.path.abspath(recording)]
+    command += ["--agent", build.agent, "--index", str(index), "--out", out]
+    process = subprocess.run(
+        command, cwd=tree, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if process.returncode:
+        message = process.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(f"{build.name}: {message[-1] if message else 'failed'}")
+
+
+def _read(path: str) -> Iterator[Dict]:
+    with open(path) as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def first_divergence(
+    base: Iterator[Dict], head: Iterator[Dict], tolerances: Dict[str, float]
+) -> Tuple[int, Optional[Divergence]]:
+    """Compare two streams of `TickOutput` dicts. Returns the number of ticks compared,
+    and the first divergence (or None). Booleans must match exactly; other controls
+    may differ by up to their tolerance (`DEFAULT_TOLERANCE` if not given)."""
+    ticks = 0
+    for before, after in zip_longest(base, head):
+        if before is None or after is None:
+            last = before or after
+            return ticks, Divergence(
+                last["tick"],
+                last["time"],
+                "length",
+                "ended" if before is None else "",
+                "ended" if after is None else "",
+                "" if before is None else before["task"],
+                "" if after is None else after["task"],
+            )
+        ticks += 1
+        for control in CONTROLS:
+            a, b = before["controls"][control], after["controls"][control]
+            if isinstance(a, bool) or isinstance(b, bool):
+                same = a == b
+            else:
+                same = abs(a - b) <= tolerances.get(control, DEFAULT_TOLERANCE)
+            if not same:
+                return ticks, Divergence(
+                    before["tick"],
+                    before["time"],
+                    control,
+                    a,
+                    b,
+                    before["task"],
+                    after["task"],
+                )
+    return ticks, None
+
+
+def diff_recordings(
+    recordings: List[str],
+    base: Build,
+    head: Build,
+    index: int = 0,
+    tolerances: Optional[Dict[str, float]] = None,
+    jobs: Optional[int] = None,
+) -> List[Result]:
+    """Run each recording through both builds, in parallel, and compare the outputs.
+    Returns one `Result` per recording, in order."""
+    tolerances = tolerances or {}
+    with tempfile.TemporaryDirectory() as temp, ThreadPoolExecutor(
+        jobs or os.cpu_count()
+    ) as pool:
+        futures = []
+        for number, recording in enumerate(recordings):
+            outs = [os.path.join(temp, f"{number}.{side}.jsonl") for side in "ab"]
+            runs = [
+                pool.submit(run_build, build, recording, index, out)
+                for build, out in zip((base, head), outs)
+            ]
+            futures.append((recording, runs, outs))
+        results = []
+        for recording, runs, outs in futures:
+            try:
+                for run in runs:
+                    run.result()
+            except Exception as exc:
+                results.append(Result(recording, 0, error=str(exc)))
+                continue
+            ticks, divergence = first_divergence(
+                _read(outs[0]), _read(outs[1]), tolerances
+            )
+            results.append(Result(recording, ticks, divergence))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recordings", nargs="+", help="files written by Recorder")
+    parser.add_argument("--agent", help="module:ClassName, for both builds")
+    parser.add_argument("--base-agent", help="module:ClassName for the base build")
+    parser.add_argument("--head-agent", help="module:ClassName for the head build")
+    parser.add_argument("--base", default=".", help="source tree of the base build")
+    parser.add_argument("--head", default=".", help="source tree of the head build")
+    parser.add_argument("--index", type=int, default=0, help="the agent's car index")
+    parser.add_argument(
+        "--tolerance",
+        action="append",
+        default=[],
+        metavar="CONTROL=VALUE",
+        help=f"allowed difference for a control (default: {DEFAULT_TOLERANCE})",
+    )
+    parser.add_argument("--jobs", type=int, default=None, help="parallel processes")
+    args = parser.parse_args(argv)
+
+    base_agent = args.base_agent or args.agent
+    head_agent = args.head_agent or args.agent
+    if not base_agent or not head_agent:
+        parser.error("give --agent, or both --base-agent and --head-agent")
+    tolerances = {}
+    for item in args.tolerance:
+        control, _, value = item.partition("=")
+        if control not in CONTROLS:
+            parser.error(f"unknown control {control!r}")
+        tolerances[control] = float(value)
+    results = diff_recordings(
+        args.recordings,
+        Build("base", args.base, base_agent),
+        Build("head", args.head, head_agent),
+        args.index,
+        tolerances,
+        args.jobs,
+    )
+    for result in results:
+        print(result)
+    return int(any(result.divergence or result.error for result in results))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
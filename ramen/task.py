@@ -49,7 +49,30 @@ minimum value when the task cannot possibly be accomplished in the current situa
 task is appropriate. It's best to use the maximum possible value, and let the agent
 adjust the weight as appropriate. Any task that is going to be a "default" should be one
 that can always be done, so the maximum score makes sense here.
+
+# Gates and bounds
+
+Scoring every task every tick gets expensive as tasks are added, so a task can help the
+agent skip work:
+
+* `gate` is a cheap check (wheel contact, kickoff position, ...) that rules the task out
+entirely. When it returns False, `score` isn't called and the task gets `closed_score`.
+Put checks there instead of at the top of `score`.
+* `score_bound` is the highest value `score` can ever return. The agent scores tasks in
+order of weighted bound, and stops once no remaining task could beat the best score so
+far (or the current task, plus the switch threshold). Keep it honest--a bound that's too
+low means the task may never get picked. The default, infinity, means the task is always
+scored.
+
+Some scores don't change much from one tick to the next. Set `refresh_ticks` or
+`refresh_ms` (game time) and the agent will reuse the last score until the interval is
+up, spreading tasks out so they don't all refresh on the same tick. The current task,
+tasks whose score is close to taking over, and tasks whose gate just opened are always
+rescored.
 """
+from typing import Tuple
+
+from vitamins.math import inf
 
 from ramen.action import Action
 
@@ -59,11 +82,29 @@ class Task:
     name: str = ""
     status: str = ""
     action: Action = None
+    score_bound: float = inf  # highest value that `score` can return
+    closed_score: float = 0  # score reported while `gate` is closed
+    refresh_ticks: int = 1  # rescore at most this often, in ticks...
+    refresh_ms: float = 0  # ...and in game milliseconds
+    enabled: bool = True  # disabled tasks are never scored or chosen
+    # Attributes that `ramen.tuning` may change while the bot runs:
+    tunables: Tuple[str, ...] = (
+        "score_bound",
+        "closed_score",
+        "refresh_ticks",
+        "refresh_ms",
+    )
+
+    def gate(self) -> bool:
+        """Cheap check of whether this task is possible at all right now. If False,
+        `score` isn't called, and the task scores `closed_score`."""
+        return True
 
     def score(self) -> float:
         """Return a float representing how easily and with what certainty this task can
         be carried out. Should not incorporate whether this task is the right choice at
-        the moment (the Agent influences that via task weights).
+        the moment (the Agent influences that via task weights). Only called while
+        `gate` is open.
         """
         return 1
 
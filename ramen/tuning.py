@@ -0,0 +1,312 @@
+"""ramen.tuning -- change task weights and thresholds while the bot is running.
+
+Give the agent a `TuningServer`, and it takes requests from a tuning console between
+ticks, over a `vitamins.comms` socket:
+
+.. sourcecode:: python
+
+    from ramen.tuning import TuningServer
+
+    class MyAgent(TaskAgent):
+        def __init__(self, name, team, index):
+            super().__init__(name, team, index)
+            self.tuning = TuningServer()
+
+Then, from another Python session:
+
+.. sourcecode:: python
+
+    from ramen.tuning import TuningClient
+
+    console = TuningClient()
+    console.scores()
+    console.set_weight("BounceShot", 1.5)
+    console.set("BounceShot", "boost_threshold", 0.3)
+    console.set("agent", "task_switch_threshold", 0.1)
+    console.disable("GitYeeted")
+    console.start_profiler()
+    print(console.stop_profiler())
+
+Tasks are named by their `name`, or their class name if they don't have one, or by their
+index in `tasks`. `get` reads any public number or bool attribute of a task or of the
+agent, but `set` only changes the ones listed in its class's `tunables`, and a new value
+must have the same type as the old one (an int will do for a float). To make more of
+your own attributes tunable, add them to the list:
+
+.. sourcecode:: python
+
+    class BounceShot(Task):
+        tunables = Task.tunables + ("boost_threshold",)
+
+Every argument of a command is required. Requests are handled at the start of
+`get_output`, for at most `budget_ms` per tick; the rest wait for the next tick, so a
+busy console can't stall the bot. A request that fails, for whatever reason, gets an
+error reply, and the bot carries on.
+
+Requests and replies are JSON strings, and the server leaves pickle out of its codecs,
+so nothing sent to the port can run code in the bot.
+"""
+import json
+from typing import Any, Dict, Optional, Tuple
+from time import monotonic, sleep
+
+from vitamins.comms import SAFE_CODECS, Client, Host, Message
+from vitamins.match.match import Match
+from vitamins.profiler import TickProfiler
+from vitamins.util import perf_counter_ns
+
+PORT_OFFSET = 1
+REPLY_TAG = "reply"
+
+_NUMBER = (int, float)
+
+# Command name -> argument name -> allowed types. All arguments are required:
+COMMANDS: Dict[str, Dict[str, Tuple[type, ...]]] = {
+    "get_weight": {"task": (str, int)},
+    "set_weight": {"task": (str, int), "weight": _NUMBER},
+    "enable": {"task": (str, int)},
+    "disable": {"task": (str, int)},
+    "scores": {},
+    "get": {"target": (str, int), "attribute": (str,)},
+    "set": {"target": (str, int), "attribute": (str,), "value": (bool, int, float)},
+    "start_profiler": {"startup": (int,)},
+    "stop_profiler": {},
+    "profile": {},
+}
+
+
+class TuningError(Exception):
+    pass
+
+
+def task_name(task) -> str:
+    return task.name or type(task).__name__
+
+
+class TuningServer:
+    """Handles tuning requests for an agent, between ticks.
+
+    :param queue: Where requests come from. By default, a `Host` on `PORT_OFFSET`.
+    :param budget_ms: Most time spent on requests per tick. At least one request is
+        handled per tick, however long it takes.
+    """
+
+    def __init__(self, queue: Optional[Host] = None, budget_ms: float = 0.5):
+        if queue is None:
+            queue = Host(port_offset=PORT_OFFSET, rate=120, codecs=SAFE_CODECS)
+        self.queue = queue
+        self.budget_ns = budget_ms * 1e6
+        self.handled = 0
+        self.failed = 0
+
+    def process(self, agent) -> int:
+        """Handle waiting requests until they run out or the time budget does. Return
+        the number handled."""
+        start = perf_counter_ns()
+        count = 0
+        while count == 0 or perf_counter_ns() - start < self.budget_ns:
+            item = self.queue.get_with_client()
+            if item is None:
+                break
+            client, message = item
+            self.queue.put(REPLY_TAG, self.handle(agent, message), client)
+            count += 1
+        return count
+
+    def handle(self, agent, message: Message) -> str:
+        """Carry out one request, and return the reply."""
+        reply: Dict[str, Any] = {"request": message.id}
+        try:
+            args = self._arguments(message)
+            reply["result"] = getattr(self, f"_{message.tag}")(agent, **args)
+            self.handled += 1
+        except TuningError as exc:
+            reply["error"] = str(exc)
+            self.failed += 1
+        except Exception as exc:  # nothing from a console may stop the tick
+            reply["error"] = f"{type(exc).__name__}: {exc}"
+            self.failed += 1
+        return json.dumps(reply)
+
+    @staticmethod
+    def _arguments(message: Message) -> Dict[str, Any]:
+        params = COMMANDS.get(message.tag)
+        if params is None:
+            raise TuningError(f"unknown command {message.tag!r}")
+        try:
+            args = json.loads(message.data) if message.data else {}
+        except (TypeError, ValueError):
+            raise TuningError("arguments must be a JSON object")
+        if not isinstance(args, dict):
+            raise TuningError("arguments must be a JSON object")
+        for name, value in args.items():
+            types = params.get(name)
+            if types is None:
+                raise TuningError(f"{message.tag} has no argument {name!r}")
+            if not isinstance(value, types) or (
+                isinstance(value, bool) and bool not in types
+            ):
+                raise TuningError(f"wrong type for {name}: {value!r}")
+        missing = [name for name in params if name not in args]
+        if missing:
+            raise TuningError(f"{message.tag} needs {', '.join(missing)}")
+        return args
+
+    @staticmethod
+    def _find_task(agent, task) -> int:
+        tasks = getattr(agent, "tasks", None)
+        if tasks is None:
+            raise TuningError("the agent doesn't have tasks")
+        if isinstance(task, int):
+            if 0 <= task < len(tasks):
+                return task
+        else:
+            for i, (candidate, _) in enumerate(tasks):
+                if task_name(candidate) == task:
+                    return i
+        raise TuningError(f"no task {task!r}")
+
+    def _target(self, agent, target):
+        if target == "agent":
+            return agent
+        return agent.tasks[self._find_task(agent, target)][0]
+
+    def _get_weight(self, agent, task) -> float:
+        return agent.tasks[self._find_task(agent, task)][1]
+
+    def _set_weight(self, agent, task, weight) -> float:
+        i = self._find_task(agent, task)
+        target = agent.tasks[i][0]
+        agent.tasks[i] = (target, weight)
+        agent._last_scores[i] = None  # it was weighted by the old weight
+        if target is agent.current_task:
+            agent.current_weight = weight
+        return weight
+
+    def _enable(self, agent, task) -> bool:
+        agent.tasks[self._find_task(agent, task)][0].enabled = True
+        return True
+
+    def _disable(self, agent, task) -> bool:
+        # The agent drops it the next time it could switch tasks:
+        agent.tasks[self._find_task(agent, task)][0].enabled = False
+        return False
+
+    def _scores(self, agent) -> Dict[str, Any]:
+        tasks = getattr(agent, "tasks", [])
+        scores = getattr(agent, "task_scores", [])
+        current = getattr(agent, "current_task", None)
+        return {
+            "current": None if current is None else task_name(current),
+            "current_score": getattr(agent, "current_score", None),
+            "tasks": [
+                {
+                    "task": task_name(task),
+                    "weight": weight,
+                    "score": scores[i] if i < len(scores) else None,
+                    "enabled": task.enabled,
+                }
+                for i, (task, weight) in enumerate(tasks)
+            ],
+        }
+
+    def _attribute(self, agent, target, attribute) -> Tuple[Any, Any]:
+        obj = self._target(agent, target)
+        value = getattr(obj, attribute, None)
+        if attribute.startswith("_") or not isinstance(value, (bool, int, float)):
+            raise TuningError(f"{target} has no number attribute {attribute!r}")
+        return obj, value
+
+    def _get(self, agent, target, attribute):
+        return self._attribute(agent, target, attribute)[1]
+
+    def _set(self, agent, target, attribute, value):
+        obj, old = self._attribute(agent, target, attribute)
+        if attribute not in getattr(obj, "tunables", ()):
+            raise TuningError(f"{attribute} of {target} isn't tunable")
+        if isinstance(old, bool) != isinstance(value, bool) or (
+            isinstance(old, int) and not isinstance(value, int)
+        ):
+            raise TuningError(f"{attribute} is {type(old).__name__}, not {value!r}")
+        setattr(obj, attribute, value)
+        return value
+
+    def _start_profiler(self, agent, startup: int) -> bool:
+        Match.profiler = TickProfiler(startup)
+        return True
+
+    def _stop_profiler(self, agent) -> Optional[str]:
+        """Turn the profiler off, and return its report."""
+        profiler, Match.profiler = Match.profiler, None
+        return None if profiler is None else profiler.report()
+
+    def _profile(self, agent) -> Optional[Dict[str, Dict[str, float]]]:
+        return None if Match.profiler is None else Match.profiler.summary()
+
+
+class TuningClient:
+    """Sends tuning requests to a `TuningServer`, and waits for the replies. Each method
+    returns the result, or raises `TuningError`, or `TimeoutError` if there's no reply
+    within `timeout` seconds (the bot only answers while it's running ticks)."""
+
+    def __init__(
+        self, port_offset: int = PORT_OFFSET, host: str = "localhost", timeout=2.0
+    ):
+        self.queue = Client(host, port_offset, rate=1000, codecs=SAFE_CODECS)
+        self.timeout = timeout
+
+    def call(self, command: str, **args) -> Any:
+        if command not in COMMANDS:
+            raise TuningError(f"unknown command {command!r}")
+        deadline = monotonic() + self.timeout
+        while not self.queue.connect(timeout=self.timeout):
+            if monotonic() > deadline:
+                raise TimeoutError("can't connect to the bot")
+        request = self.queue.put(command, json.dumps(args))
+        while monotonic() < deadline:
+            message = self.queue.get()
+            if message is None:
+                sleep(0.001)
+                continue
+            if message.tag != REPLY_TAG:
+                continue
+            reply = json.loads(message.data)
+            if reply["request"] != request:
+                continue
+            if "error" in reply:
+                raise TuningError(reply["error"])
+            return reply["result"]
+        raise TimeoutError(f"no reply to {command}")
+
+    def get_weight(self, task) -> float:
+        return self.call("get_weight", task=task)
+
+    def set_weight(self, task, weight: float) -> float:
+        return self.call("set_weight", task=task, weight=weight)
+
+    def enable(self, task) -> bool:
+        return self.call("enable", task=task)
+
+    def disable(self, task) -> bool:
+        return self.call("disable", task=task)
+
+    def scores(self) -> Dict[str, Any]:
+        return self.call("scores")
+
+    def get(self, target, attribute: str):
+        return self.call("get", target=target, attribute=attribute)
+
+    def set(self, target, attribute: str, value):
+        return self.call("set", target=target, attribute=attribute, value=value)
+
+    def start_profiler(self, startup: int = 0) -> bool:
+        return self.call("start_profiler", startup=startup)
+
+    def stop_profiler(self) -> Optional[str]:
+        return self.call("stop_profiler")
+
+    def profile(self) -> Optional[Dict[str, Dict[str, float]]]:
+        return self.call("profile")
+
+    def close(self):
+        self.queue.close()
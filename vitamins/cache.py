@@ -0,0 +1,130 @@
+"""The `vitamins.cache` module memoizes results for the duration of a single game tick.
+
+Many score functions get called several times per tick with the same arguments, from
+different tasks and from the agent. Since the game state doesn't change during a tick,
+the result doesn't either. Decorate such functions with `per_tick` and the work is done
+only once per tick:
+
+.. sourcecode:: python
+
+    from vitamins.cache import per_tick
+
+    @per_tick()
+    def high_ball() -> float:
+        ...
+
+All caches are invalidated at once when `Match.update` calls `new_tick`, so there is
+nothing to clear by hand. Arguments are compared by hash, which for `Vec3` and the
+match objects means by identity. Cached results are shared by every caller in the tick,
+so don't modify a returned object in place--make a copy instead.
+
+Each cache keeps hit and miss counters, so you can see which functions are worth
+caching with `stats()`.
+"""
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, List
+
+current_tick: int = 0
+_generation: int = 0
+_caches: List["TickCache"] = []
+
+_MISSING = object()
+_KWARGS = object()  # separates positional from keyword arguments in cache keys
+
+
+class TickCache:
+    """A bounded key-value store whose contents are discarded at every new tick.
+
+    :param name: Name shown in `stats()`.
+    :param maxsize: Maximum number of entries kept per tick. Once full, the oldest
+        entry is dropped to make room for a new one.
+    """
+
+    def __init__(self, name: str, maxsize: int = 64):
+        self.name = name
+        self.maxsize = maxsize
+        self.results: Dict[Hashable, Any] = {}
+        self.generation = _generation
+        self.hits = 0
+        self.misses = 0
+        _caches.append(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value stored for `key` this tick, or `default`."""
+        if self.generation != _generation:
+            self.results.clear()
+            self.generation = _generation
+        value = self.results.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store `value` for `key` until the end of the tick."""
+        if self.generation != _generation:
+            self.results.clear()
+            self.generation = _generation
+        if len(self.results) >= self.maxsize:
+            del self.results[next(iter(self.results))]
+        self.results[key] = value
+
+    def clear(self):
+        self.results.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def per_tick(maxsize: int = 64) -> Callable[[Callable], Callable]:
+    """Function decorator that caches results for the current tick, keyed on the
+    arguments. Calls with unhashable arguments are passed straight through. The
+    decorated function gets a `cache` attribute holding its `TickCache`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        cache = TickCache(func.__qualname__, maxsize)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = args + (_KWARGS,) + tuple(kwargs.items()) if kwargs else args
+            try:
+                result = cache.get(key, _MISSING)
+            except TypeError:
+                return func(*args, **kwargs)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def new_tick(tick: int):
+    """Invalidate every cache. Called by `Match.update` at the start of each tick."""
+    global current_tick, _generation
+    current_tick = tick
+    _generation += 1
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Return hit/miss counts for every cache, busiest first."""
+    caches = sorted(_caches, key=lambda c: c.hits + c.misses, reverse=True)
+    return {
+        c.name: {"hits": c.hits, "misses": c.misses, "hit_rate": c.hit_rate}
+        for c in caches
+    }
+
+
+def reset_stats():
+    for cache in _caches:
+        cache.reset_stats()
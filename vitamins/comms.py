@@ -14,14 +14,30 @@ the type of message, e.g. command, status, query, etc. Finally, the `data` can b
 pickleable Python object. This could be a number, a string, `None` (in case the `tag` is
 meaningful all by itself, a dictionary, or even a class instance (assuming the program
 on the other end of the connection has the same class definition available).
+
+# Wire format
+
+Each message is sent as one frame: a fixed-size header (payload length, message id, tag
+length, and codec id), then the tag in UTF-8, then the payload. Frames that arrive in
+pieces are put back together, however the stream gets split up between polls.
+
+The codec turns the data into the payload and back. The first codec in the list that
+accepts the data is used, so numbers, strings, bytes, tuples of floats, `array.array`
+and numpy arrays are packed directly with `struct`, and anything else falls back to
+pickle. Pickle is slow, and unpickling data from an untrusted peer can run arbitrary
+code; pass `codecs=SAFE_CODECS` to leave it out. You can also add your own `Codec`s,
+with ids of 64 and up.
 """
+from array import array
 from collections import deque, namedtuple
-from typing import Any, Optional
-import io
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
 import pickle
+import selectors
 import socket
+import struct
 from time import monotonic as now
 
+import numpy as np
 
 HOST: str = "localhost"
 PORT: int = 16849
@@ -33,6 +49,177 @@ NOCLIENT_SPAM_INTERVAL: int = 10
 Message = namedtuple("Message", "id, tag, data")
 # id is int, tag is str, data is anything.
 
+# Payload length, message id, tag length, codec id:
+HEADER = struct.Struct("<IqHB")
+
+
+class Codec(NamedTuple):
+    """Encodes message data as bytes, and decodes it again. `encode` returns None for
+    data it doesn't handle, so the next codec can try. `decode` is given a memoryview of
+    a receive buffer that will be reused, so it must copy anything it keeps."""
+
+    id: int
+    encode: Callable[[Any], Optional[bytes]]
+    decode: Callable[[memoryview], Any]
+
+
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+
+def _encode_int(data):
+    if type(data) is int and -(2**63) <= data < 2**63:
+        return _INT.pack(data)
+
+
+def _encode_floats(data):
+    if type(data) is tuple and all(type(x) is float for x in data):
+        return array("d", data).tobytes()
+
+
+def _decode_floats(payload):
+    result = array("d")
+    result.frombytes(payload)
+    return tuple(result)
+
+
+def _encode_array(data):
+    if isinstance(data, array):
+        return data.typecode.encode() + data.tobytes()
+
+
+def _decode_array(payload):
+    result = array(chr(payload[0]))
+    result.frombytes(payload[1:])
+    return result
+
+
+def _encode_ndarray(data):
+    if isinstance(data, np.ndarray) and not data.dtype.hasobject:
+        dtype = data.dtype.str.encode()
+        shape = struct.pack(f"<{data.ndim}q", *data.shape)
+        return b"".join(
+            (bytes((len(dtype), data.ndim)), dtype, shape, np.ascontiguousarray(data))
+        )
+
+
+def _decode_ndarray(payload):
+    dtype_length, ndim = payload[0], payload[1]
+    dtype = np.dtype(bytes(payload[2 : 2 + dtype_length]).decode())
+    start = 2 + dtype_length
+    shape = struct.unpack_from(f"<{ndim}q", payload, start)
+    data = np.frombuffer(payload, dtype=dtype, offset=start + 8 * ndim)
+    return data.reshape(shape).copy()
+
+
+PICKLE = Codec(0, pickle.dumps, pickle.loads)
+SAFE_CODECS: List[Codec] = [
+    Codec(1, lambda data: b"" if data is None else None, lambda payload: None),
+    Codec(2, _encode_int, lambda payload: _INT.unpack(payload)[0]),
+    Codec(
+        3,
+        lambda data: _FLOAT.pack(data) if type(data) is float else None,
+        lambda payload: _FLOAT.unpack(payload)[0],
+    ),
+    Codec(
+        4,
+        lambda data: data.encode() if type(data) is str else None,
+        lambda payload: bytes(payload).decode(),
+    ),
+    Codec(
+        5,
+        lambda data: data if isinstance(data, (bytes, bytearray)) else None,
+        bytes,
+    ),
+    Codec(6, _encode_floats, _decode_floats),
+    Codec(7, _encode_array, _decode_array),
+    Codec(8, _encode_ndarray, _decode_ndarray),
+]
+CODECS: List[Codec] = SAFE_CODECS + [PICKLE]
+
+
+def encode_frame(
+    msg_id: int, tag: str, data: Any, codecs: List[Codec] = CODECS
+) -> bytes:
+    """Return the frame for one message, using the first codec that accepts `data`."""
+    tag_bytes = tag.encode()
+    for codec in codecs:
+        payload = codec.encode(data)
+        if payload is not None:
+            header = HEADER.pack(len(payload), msg_id, len(tag_bytes), codec.id)
+            return b"".join((header, tag_bytes, payload))
+    raise TypeError(f"No codec for {type(data).__name__} data")
+
+
+class FrameReader:
+    """Receives frames into a buffer that is allocated once, and reused (it only grows
+    if a frame doesn't fit). Bytes of a frame that hasn't fully arrived yet stay in the
+    buffer until the rest of it comes in.
+
+    :param size: Initial buffer size.
+    :param codecs: Codecs for decoding. Frames with any other codec id are skipped, and
+        counted in `undecodable`.
+    """
+
+    def __init__(self, size: int = BUFFSIZE, codecs: List[Codec] = CODECS):
+        self.decoders = {codec.id: codec.decode for codec in codecs}
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.undecodable = 0
+
+    def receive(self, sock: socket.socket, inq: Deque[Message]) -> bool:
+        """Read everything waiting on the (non-blocking) socket, and append the
+        messages in all complete frames to `inq`. Return False if the peer closed the
+        connection."""
+        while True:
+            if self.length == len(self.buffer):
+                self._decode(inq)
+                if self.length == len(self.buffer):
+                    self._grow(2 * len(self.buffer))
+            try:
+                received = sock.recv_into(self.view[self.length :])
+            except BlockingIOError:
+                break
+            if not received:
+                self._decode(inq)
+                return False
+            self.length += received
+        self._decode(inq)
+        return True
+
+    def _decode(self, inq: Deque[Message]):
+        position, view = 0, self.view
+        while self.length - position >= HEADER.size:
+            payload_length, msg_id, tag_length, codec_id = HEADER.unpack_from(
+                view, position
+            )
+            start = position + HEADER.size
+            end = start + tag_length + payload_length
+            if end > self.length:
+                if end - position > len(self.buffer):
+                    self._grow(end - position)
+                break
+            decode = self.decoders.get(codec_id)
+            if decode is None:
+                self.undecodable += 1
+            else:
+                tag = bytes(view[start : start + tag_length]).decode()
+                inq.append(Message(msg_id, tag, decode(view[start + tag_length : end])))
+            position = end
+        if position:
+            # Move the start of any partial frame to the front of the buffer:
+            self.length -= position
+            self.buffer[: self.length] = self.buffer[position : position + self.length]
+
+    def _grow(self, size: int):
+        self.view.release()
+        self.buffer.extend(bytes(size - len(self.buffer)))
+        self.view = memoryview(self.buffer)
+
+    def clear(self):
+        self.length = 0
+
 
 class SocketQueue:
     """This is the base class for Host and Client, which should be used for
@@ -47,11 +234,15 @@ class SocketQueue:
         port_offset: int = 0,
         buffsize: int = BUFFSIZE,
         rate: int = DEFAULT_RATE,
+        codecs: List[Codec] = CODECS,
     ):
         self.host = host
         self.port = PORT + port_offset
         self.buffsize = buffsize
+        self.codecs = codecs
         self.inq, self.outq = deque(), deque()
+        self.reader = FrameReader(buffsize, codecs)
+        self.unsent = bytearray()  # frames (or the rest of one) the socket didn't take
         self.connected = False
         self.endpoint = None
         self.socket = None
@@ -68,34 +259,41 @@ class SocketQueue:
         if not self.connected or now() < self.next_poll:
             return
         self.next_poll += self.poll_interval
-        data = []
-        while True:
-            try:
-                data.append(self.endpoint.recv(BUFFSIZE))
-            except BlockingIOError:
-                break
-        if data:
-            stream = io.BytesIO(b"".join(data))
-            while True:
-                try:
-                    info = pickle.load(stream)
-                    msg = Message(*info)
-                    self.inq.append(msg)
-                except EOFError:
-                    break
+        try:
+            still_open = self.reader.receive(self.endpoint, self.inq)
+        except OSError:
+            still_open = False
+        if not still_open:
+            self._disconnected()
 
     def _send(self) -> None:
         """Encode any data in the outgoing queue and send it to the socket."""
         if not self.connected or now() < self.next_send:
             return
         self.next_send += self.poll_interval
-        buff = []
         while self.outq:
             msg_id, tag, data = self.outq.popleft()
-            buff.append(pickle.dumps((msg_id, tag, data)))
-        if buff:
-            stream = b"".join(buff)
-            self.endpoint.sendall(stream)
+            self.unsent += encode_frame(msg_id, tag, data, self.codecs)
+        # Send as much as the socket will take; the rest waits for the next time:
+        try:
+            while self.unsent:
+                sent = self.endpoint.send(self.unsent)
+                del self.unsent[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._disconnected()
+
+    def _disconnected(self) -> None:
+        """Forget the connection, after the peer has gone away."""
+        if self.endpoint is not None:
+            self.endpoint.close()
+            if self.endpoint is self.socket:
+                self.socket = None  # the client makes a new socket to reconnect
+        self.endpoint = None
+        self.connected = False
+        self.reader.clear()
+        self.unsent.clear()
 
     def put(self, tag: str, data: Any = None) -> int:
         """Put (tag, data) into the queue. Return the index.
@@ -114,38 +312,232 @@ class SocketQueue:
             return None
         return self.inq.popleft()
 
+    def flush(self) -> None:
+        """Send what's waiting, if it's time to. `put` does this anyway, so this is
+        only needed to keep sending while nothing new is put."""
+        self._send()
+
+    def pending(self) -> int:
+        """Bytes waiting to be sent. A message that hasn't been encoded yet counts as
+        one byte, so this is 0 only when everything put so far has gone out."""
+        return len(self.unsent) + len(self.outq)
+
     def close(self) -> None:
         if self.socket is not None:
             self.socket.close()
 
 
+class _Connection:
+    """One client of a `Host`."""
+
+    def __init__(self, client_id: int, sock: socket.socket, address, host: "Host"):
+        self.id = client_id
+        self.socket = sock
+        self.address = address
+        self.reader = FrameReader(host.buffsize, host.codecs)
+        self.inq: Deque[Message] = deque()
+        self.unsent = bytearray()
+        self.sent_bytes = 0
+        self.dropped = 0
+
+    def flush(self) -> bool:
+        """Send as much of the queue as the socket will take. Return False if the
+        connection is broken."""
+        try:
+            while self.unsent:
+                sent = self.socket.send(self.unsent)
+                del self.unsent[:sent]
+                self.sent_bytes += sent
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        return True
+
+
 class Host(SocketQueue):
+    """Serves any number of clients at once (a dashboard, a logger, and a tuning
+    console, say), without ever blocking.
+
+    Messages from all clients arrive in one queue; `get_with_client` tells which client
+    each came from. `put` sends to every client, or just one, and encodes the message
+    only once however many clients there are. Each client has its own send queue, of at
+    most `client_queue_bytes`: a client that can't keep up misses the messages that
+    don't fit, which are counted in its `dropped` stat. Messages put while no client is
+    connected are discarded.
+
+    :param max_clients: Further connections are closed as soon as they're accepted.
+    :param client_queue_bytes: Limit on each client's queue of unsent data.
+    """
+
     first_index: int = 0
+    bind_retry_max: float = 5  # longest wait (seconds) between tries to bind the port
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port_offset: int = 0,
+        buffsize: int = BUFFSIZE,
+        rate: int = DEFAULT_RATE,
+        codecs: List[Codec] = CODECS,
+        max_clients: int = 16,
+        client_queue_bytes: int = 1 << 20,
+    ):
+        super().__init__(host, port_offset, buffsize, rate, codecs)
+        self.max_clients = max_clients
+        self.client_queue_bytes = client_queue_bytes
+        self.selector = selectors.DefaultSelector()
+        self.clients: Dict[int, _Connection] = {}
+        self.next_client_id = 1
+        self.undelivered = 0
+        self._bind_delay = 0.0
+        self._next_bind = now()
+
+    def _listen(self) -> bool:
+        """Make sure the listening socket is open. If the port can't be bound (it may
+        still be held by a previous run), try again later, waiting longer each time."""
+        if self.socket is not None:
+            return True
+        if now() < self._next_bind:
+            return False
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, self.port))
+            sock.listen(self.max_clients)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            self._bind_delay = min(max(2 * self._bind_delay, 0.1), self.bind_retry_max)
+            self._next_bind = now() + self._bind_delay
+            return False
+        self._bind_delay = 0.0
+        self.socket = sock
+        self.selector.register(sock, selectors.EVENT_READ)
+        return True
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.socket.accept()
+            except OSError:  # including BlockingIOError, when there are no more
+                return
+            if len(self.clients) >= self.max_clients:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            client = _Connection(self.next_client_id, sock, address, self)
+            self.next_client_id += 1
+            self.clients[client.id] = client
+            self.selector.register(sock, selectors.EVENT_READ, client)
+
+    def _drop(self, client: _Connection):
+        self.selector.unregister(client.socket)
+        client.socket.close()
+        del self.clients[client.id]
+
+    def _poll(self):
+        """Accept new clients, and read from the ones that have sent something."""
+        if not self._listen():
+            return
+        for key, _ in self.selector.select(timeout=0):
+            client = key.data
+            if client is None:
+                self._accept()
+                continue
+            try:
+                still_open = client.reader.receive(client.socket, client.inq)
+            except OSError:
+                still_open = False
+            while client.inq:
+                self.inq.append((client.id, client.inq.popleft()))
+            if not still_open:
+                self._drop(client)
+        self.connected = bool(self.clients)
 
     def connect(self) -> bool:
-        """Try to connect to a client. Return True if a connection was successfully
-        made (or already existed), False if not. A return value of False is expected,
-        e.g., when there is no client trying to connect.
+        """Accept any clients that are trying to connect. Return True if there is at
+        least one client. A return value of False is expected, e.g., when there is no
+        client trying to connect.
         """
-        if self.socket is None:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.bind((self.host, self.port))
-            self.socket.setblocking(False)
-            self.socket.listen(1)
-        if self.endpoint is None:
-            if self.socket is not None:
-                try:
-                    self.endpoint, _ = self.socket.accept()
-                    self.connected = True
-                    return True
-                except (BlockingIOError, OSError):
-                    pass
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.bind((self.host, self.port))
-            self.socket.setblocking(False)
-            self.socket.listen(1)
+        self._poll()
         return self.connected
 
+    def _recv(self) -> None:
+        if now() < self.next_poll:
+            return
+        self.next_poll += self.poll_interval
+        self._poll()
+
+    def _send(self) -> None:
+        if now() < self.next_send:
+            return
+        self.next_send += self.poll_interval
+        for client in list(self.clients.values()):
+            if client.unsent and not client.flush():
+                self._drop(client)
+        self.connected = bool(self.clients)
+
+    def pending(self) -> int:
+        """Bytes waiting to be sent to the client that's furthest behind."""
+        return max((len(client.unsent) for client in self.clients.values()), default=0)
+
+    def put(self, tag: str, data: Any = None, client: Optional[int] = None) -> int:
+        """Send (tag, data) to all clients, or only to the one with id `client`.
+        Return the message id."""
+        msg_id = self.msg_index
+        self.msg_index += 2
+        if client is None:
+            clients = list(self.clients.values())
+        else:
+            clients = [self.clients[client]] if client in self.clients else []
+        if not clients:
+            self.undelivered += 1
+        else:
+            frame = encode_frame(msg_id, tag, data, self.codecs)
+            for connection in clients:
+                if len(connection.unsent) + len(frame) > self.client_queue_bytes:
+                    connection.dropped += 1
+                else:
+                    connection.unsent += frame
+        self._send()
+        return msg_id
+
+    def get(self) -> Optional[Message]:
+        """Return the next incoming message (from any client), or None."""
+        item = self.get_with_client()
+        return None if item is None else item[1]
+
+    def get_with_client(self) -> Optional[Tuple[int, Message]]:
+        """Return the id of the client that sent the next incoming message, and the
+        message, or None if there isn't one."""
+        self._recv()
+        if not self.inq:
+            return None
+        return self.inq.popleft()
+
+    def client_stats(self) -> Dict[int, Dict[str, Any]]:
+        """For each client (by id), its address, bytes waiting to be sent and sent so
+        far, and the number of messages dropped because its queue was full."""
+        return {
+            client.id: {
+                "address": client.address,
+                "queued_bytes": len(client.unsent),
+                "sent_bytes": client.sent_bytes,
+                "dropped": client.dropped,
+            }
+            for client in self.clients.values()
+        }
+
+    def close(self) -> None:
+        for client in list(self.clients.values()):
+            self._drop(client)
+        if self.socket is not None:
+            self.selector.unregister(self.socket)
+            self.socket.close()
+            self.socket = None
+        self.connected = False
+
 
 class Client(SocketQueue):
     first_index: int = 1
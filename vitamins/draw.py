@@ -30,6 +30,7 @@ from rlbot.utils.rendering.rendering_manager import RenderingManager
 from vitamins.geometry import Vec3, Line
 
 renderer: RenderingManager = None
+_suspended: RenderingManager = None
 colors = {}
 
 white = None
@@ -42,6 +43,31 @@ def set_renderer(rd: RenderingManager):
     renderer = rd
 
 
+def _ignore(*args, **kwargs):
+    pass
+
+
+class NullRenderer:
+    """Stands in for a `RenderingManager`, and ignores everything drawn with it."""
+
+    def __getattr__(self, name):
+        return _ignore
+
+
+def suspend():
+    """Ignore all drawing until `resume` is called."""
+    global renderer, _suspended
+    if _suspended is None:
+        _suspended, renderer = renderer, NullRenderer()
+
+
+def resume():
+    """Undo `suspend`."""
+    global renderer, _suspended
+    if _suspended is not None:
+        renderer, _suspended = _suspended, None
+
+
 def get_color(name: str = ""):
     return getattr(renderer, name, renderer.white)()
 
@@ -1,21 +1,39 @@
 """geometry.py -- like it says
 """
-from typing import Any, Tuple
+from typing import Any, Iterable, List, Tuple
 import math
 
+import numpy as np
+
+_new_object = object.__new__
+
 
 class Vec2:
     """The `Vec2` class provides operations on two-dimensional vectors with `float`
     coordinates.
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x: object = 0, y: object = 0):
         """Creates a `Vec2` instance, either from coordinates or from a `Vec2` or
         other object which has `x` and `y` attributes."""
-        if hasattr(x, "x") and hasattr(x, "y"):
+        if x.__class__ is not float and hasattr(x, "x") and hasattr(x, "y"):
             x, y = x.x, x.y
         self.x, self.y = float(x), float(y)
 
+    @classmethod
+    def from_vec(cls, other) -> "Vec2":
+        """Copies any object with `x` and `y` attributes, skipping the type checks
+        done by the regular constructor. On a subclass, this uses the subclass's own
+        constructor."""
+        if cls is not Vec2:
+            return cls(other)
+        return _vec2(float(other.x), float(other.y))
+
+    def __iter__(self):
+        return iter((self.x, self.y))
+
     def __str__(self):
         return f"Vec2({self.x}, {self.y})"
 
@@ -23,49 +41,95 @@ class Vec2:
         return str(self)
 
     def rotated(self, theta: float) -> "Vec2":
-        return Vec2(
-            x=self.x * math.cos(theta) - self.y * math.sin(theta),
-            y=self.x * math.sin(theta) + self.y * math.cos(theta),
-        )
+        c, s = math.cos(theta), math.sin(theta)
+        return _vec2(self.x * c - self.y * s, self.x * s + self.y * c)
 
 
 class Vec3:
     """The `Vec3` class provides operations on three-dimensional vectors with `float`
     coordinates.
+
+    Instances use `__slots__`, so they are small and quick to create. The arithmetic
+    operators always return a new `Vec3`, except for the in-place operators (`+=`,
+    `-=`, `*=`), which modify the vector they are applied to. Use those in hot loops
+    where the left-hand vector is not shared with anything else.
     """
 
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x: Any = 0, y: float = 0, z: float = 0):
-        if hasattr(x, "x"):
+        if x.__class__ is float or x.__class__ is int or not hasattr(x, "x"):
+            self.x = float(x)
+            self.y = float(y)
+            self.z = float(z)
+        else:
             # We have been given a vector. Copy it
             self.x = float(x.x)
             self.y = float(x.y) if hasattr(x, "y") else 0
             self.z = float(x.z) if hasattr(x, "z") else 0
-        else:
-            self.x = float(x)
-            self.y = float(y)
-            self.z = float(z)
+
+    @classmethod
+    def from_vec(cls, other: "Vec3") -> "Vec3":
+        """Copies another `Vec3` (or a subclass, such as a `Location`). Faster than
+        `Vec3(other)` because no duck-typing is needed. On a subclass, this uses the
+        subclass's own constructor."""
+        if cls is not Vec3:
+            return cls(other)
+        return _vec3(float(other.x), float(other.y), float(other.z))
+
+    @classmethod
+    def from_struct(cls, struct) -> "Vec3":
+        """Copies an RLBot `Vector3` struct (e.g. `physics.location`). On a subclass,
+        this uses the subclass's own constructor."""
+        if cls is not Vec3:
+            return cls(struct)
+        return _vec3(float(struct.x), float(struct.y), float(struct.z))
 
     def __getitem__(self, item: int) -> float:
         return (self.x, self.y, self.z)[item]
 
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
     def __add__(self, other: "Vec3") -> "Vec3":
-        return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
+        return _vec3(self.x + other.x, self.y + other.y, self.z + other.z)
 
     def __sub__(self, other: "Vec3") -> "Vec3":
-        return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
+        return _vec3(self.x - other.x, self.y - other.y, self.z - other.z)
 
     def __neg__(self):
-        return Vec3(-self.x, -self.y, -self.z)
+        return _vec3(-self.x, -self.y, -self.z)
 
     def __mul__(self, scale: float) -> "Vec3":
-        return Vec3(self.x * scale, self.y * scale, self.z * scale)
+        scale = float(scale)  # a NumPy scalar would make the coordinates NumPy too
+        return _vec3(self.x * scale, self.y * scale, self.z * scale)
 
     def __rmul__(self, scale: float) -> "Vec3":
-        return self * scale
+        scale = float(scale)
+        return _vec3(self.x * scale, self.y * scale, self.z * scale)
 
     def __truediv__(self, scale: float) -> "Vec3":
         scale = 1 / float(scale)
-        return self * scale
+        return _vec3(self.x * scale, self.y * scale, self.z * scale)
+
+    def __iadd__(self, other: "Vec3") -> "Vec3":
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __isub__(self, other: "Vec3") -> "Vec3":
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __imul__(self, scale: float) -> "Vec3":
+        scale = float(scale)
+        self.x *= scale
+        self.y *= scale
+        self.z *= scale
+        return self
 
     def __str__(self):
         return "Vec3(" + str(self.x) + ", " + str(self.y) + ", " + str(self.z) + ")"
@@ -84,11 +148,11 @@ class Vec3:
 
     def flat(self) -> "Vec3":
         """Returns a copy of the vector projected onto the z=0 plane."""
-        return Vec3(self.x, self.y, 0)
+        return _vec3(self.x, self.y, 0.0)
 
     def length(self) -> float:
         """Returns the length of the vector. Also called magnitude and norm."""
-        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
 
     def to(self, other: "Vec3") -> "Vec3":
         return other - self
@@ -96,14 +160,16 @@ class Vec3:
     def distance(self, other: "Vec3") -> float:
         """Returns the distance between this vector and another vector using pythagoras.
         """
-        return (self - other).length()
+        dx, dy, dz = self.x - other.x, self.y - other.y, self.z - other.z
+        return math.sqrt(dx * dx + dy * dy + dz * dz)
 
     def normalized(self) -> "Vec3":
         """Returns a vector with the same direction but a length of one."""
-        if self.length() == 0:
+        length = self.length()
+        if length == 0:
             return self
         else:
-            return self / self.length()
+            return self / length
 
     def rescaled(self, new_len: float) -> "Vec3":
         """Returns a vector with the same direction but a different length."""
@@ -115,13 +181,14 @@ class Vec3:
 
     def ndot(self, other: "Vec3") -> float:
         """Returns the dot product after normalizing both vectors."""
-        if self.length() == 0 or other.length == 0:
+        lengths = self.length() * other.length()
+        if lengths == 0:
             return 0
-        return self.normalized().dot(other.normalized())
+        return self.dot(other) / lengths
 
     def cross(self, other: "Vec3") -> "Vec3":
         """Returns the cross product."""
-        return Vec3(
+        return _vec3(
             self.y * other.z - self.z * other.y,
             self.z * other.x - self.x * other.z,
             self.x * other.y - self.y * other.x,
@@ -164,7 +231,11 @@ class Vec3:
         return self.lerp(other, 1 / 2)
 
     def nearest(self, others: ["Vec3"]) -> "Vec3":
-        """Return the nearest vector in `others`."""
+        """Return the nearest vector in `others`. If `others` is a `Vec3Array`, the
+        search is done in a single vectorized step."""
+        if isinstance(others, Vec3Array):
+            index = others.nearest_index(self)
+            return others[index] if index >= 0 else None
         min_dist = 1e9
         nearest = None
         for other in others:
@@ -180,21 +251,233 @@ class Vec3:
         return (self - self.proj(other)).length()
 
 
+def _vec2(x: float, y: float) -> Vec2:
+    """Fast path for creating a `Vec2` from two floats. No type checks or conversions
+    are done, so only use this where the coordinates are known to be floats."""
+    v = _new_object(Vec2)
+    v.x = x
+    v.y = y
+    return v
+
+
+def _vec3(x: float, y: float, z: float) -> Vec3:
+    """Fast path for creating a `Vec3` from three floats. No type checks or
+    conversions are done, so only use this where the coordinates are known to be
+    floats. Values from NumPy arrays must be converted first, with `.tolist()`."""
+    v = _new_object(Vec3)
+    v.x = x
+    v.y = y
+    v.z = z
+    return v
+
+
+class Vec3Array:
+    """An array of `N` three-dimensional vectors, stored as an (N, 3) `float64` NumPy
+    array. It supports the most-used `Vec3` operations, vectorized over all `N`
+    vectors at once. Wherever another vector is expected, you can pass either a
+    `Vec3` (which is broadcast against every row) or another `Vec3Array` of the same
+    length (which is applied row by row).
+
+    Use this when the same operation is applied to many points, e.g. the distance
+    from the car to every boost pad:
+
+    .. sourcecode:: python
+
+        pads = Vec3Array.from_vecs(Match.field.boosts)
+        nearest_pad = Match.field.boosts[pads.nearest_index(Match.agent_car)]
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Any = ()):
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, 3)
+
+    @classmethod
+    def from_vecs(cls, vecs: Iterable[Vec3]) -> "Vec3Array":
+        """Create an array from any iterable of objects with `x`, `y` and `z`."""
+        return cls([(v.x, v.y, v.z) for v in vecs])
+
+    def to_vecs(self) -> List[Vec3]:
+        """Return the contents as a list of `Vec3`."""
+        return [_vec3(x, y, z) for x, y, z in self.data.tolist()]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.data[:, 2]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, item):
+        """Indexing with an integer returns a `Vec3`, anything else (slices, index
+        arrays, boolean masks) returns a `Vec3Array`."""
+        if isinstance(item, (int, np.integer)):
+            x, y, z = self.data[item].tolist()
+            return _vec3(x, y, z)
+        return Vec3Array(self.data[item])
+
+    def __iter__(self):
+        return iter(self.to_vecs())
+
+    def __add__(self, other) -> "Vec3Array":
+        return Vec3Array(self.data + _rows(other))
+
+    def __radd__(self, other) -> "Vec3Array":
+        return Vec3Array(_rows(other) + self.data)
+
+    def __sub__(self, other) -> "Vec3Array":
+        return Vec3Array(self.data - _rows(other))
+
+    def __rsub__(self, other) -> "Vec3Array":
+        return Vec3Array(_rows(other) - self.data)
+
+    def __neg__(self) -> "Vec3Array":
+        return Vec3Array(-self.data)
+
+    def __mul__(self, scale) -> "Vec3Array":
+        return Vec3Array(self.data * _scalars(scale))
+
+    def __rmul__(self, scale) -> "Vec3Array":
+        return Vec3Array(self.data * _scalars(scale))
+
+    def __truediv__(self, scale) -> "Vec3Array":
+        return Vec3Array(self.data / _scalars(scale))
+
+    def __str__(self):
+        return f"Vec3Array({len(self)} vectors)"
+
+    def __repr__(self):
+        return f"Vec3Array({self.data.tolist()})"
+
+    def flat(self) -> "Vec3Array":
+        """Returns a copy of the vectors projected onto the z=0 plane."""
+        data = self.data.copy()
+        data[:, 2] = 0
+        return Vec3Array(data)
+
+    def length(self) -> np.ndarray:
+        """Returns the length of each vector."""
+        return np.sqrt(np.einsum("ij,ij->i", self.data, self.data))
+
+    def distance(self, other) -> np.ndarray:
+        """Returns the distance from each vector to `other`."""
+        diff = self.data - _rows(other)
+        return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    def normalized(self) -> "Vec3Array":
+        """Returns vectors with the same directions but a length of one. Zero-length
+        vectors are left as they are, like `Vec3.normalized`."""
+        length = self.length()
+        length[length == 0] = 1
+        return Vec3Array(self.data / length[:, None])
+
+    def dot(self, other) -> np.ndarray:
+        """Returns the dot product of each vector with `other`."""
+        other = _rows(other)
+        if other.ndim == 1:
+            return self.data @ other
+        return np.einsum("ij,ij->i", self.data, other)
+
+    def cross(self, other) -> "Vec3Array":
+        """Returns the cross product of each vector with `other`."""
+        return Vec3Array(np.cross(self.data, _rows(other)))
+
+    def proj(self, other) -> "Vec3Array":
+        """The projection of each vector onto `other`."""
+        other_dir = _rows(other)
+        length = np.sqrt(np.sum(other_dir * other_dir, axis=-1, keepdims=True))
+        other_dir = other_dir / np.where(length == 0, 1, length)
+        dots = np.sum(self.data * other_dir, axis=-1, keepdims=True)
+        return Vec3Array(dots * other_dir)
+
+    def perp(self, other) -> "Vec3Array":
+        """The component of each vector perpendicular to `other`."""
+        return Vec3Array(self.data - self.proj(other).data)
+
+    def lerp(self, other, t) -> "Vec3Array":
+        """Linearly interpolate between each vector and `other`. `t` may be a single
+        number, or an array with one value per vector."""
+        return Vec3Array(self.data + _scalars(t) * (_rows(other) - self.data))
+
+    def yaw_to(self, other) -> np.ndarray:
+        """Returns the signed angle from each vector to `other`, as `Vec3.yaw_to`."""
+        other = _rows(other)
+        a1 = np.arctan2(-self.data[:, 0], self.data[:, 1])
+        a2 = np.arctan2(-other[..., 0], other[..., 1])
+        diff = a2 - a1
+        diff = np.where(diff > math.pi, diff - 2 * math.pi, diff)
+        return np.where(diff < -math.pi, diff + 2 * math.pi, diff)
+
+    def nearest_index(self, other) -> int:
+        """Return the index of the vector nearest to `other`, or -1 if empty."""
+        if not len(self.data):
+            return -1
+        diff = self.data - _rows(other)
+        return int(np.argmin(np.einsum("ij,ij->i", diff, diff)))
+
+
+def _rows(other) -> np.ndarray:
+    """Convert a `Vec3`, `Vec3Array` or array-like into something that broadcasts
+    against an (N, 3) array."""
+    if isinstance(other, Vec3Array):
+        return other.data
+    if hasattr(other, "x"):
+        return np.array((other.x, other.y, other.z))
+    return np.asarray(other, dtype=np.float64)
+
+
+def _scalars(scale) -> Any:
+    """Convert a scale factor (a number, or one number per vector) into something
+    that broadcasts against an (N, 3) array."""
+    if isinstance(scale, (int, float)):
+        return scale
+    scale = np.asarray(scale, dtype=np.float64)
+    return scale[:, None] if scale.ndim == 1 else scale
+
+
 class Orientation:
     """
     This class describes the orientation of an object from the rotation of the object.
     Use this to find the direction of cars: forward, right, up.
-    It can also be used to find relative locations.
+    It can also be used to find relative locations, with `to_local` and `to_world`.
+
+    The orientation is a rotation matrix whose columns are `forward`, `right` and
+    `up`. It is computed lazily, the first time any of those (or the transforms) is
+    used, so an orientation that is never looked at costs no trig at all. Call
+    `update` each tick to reuse the same instance; the matrix is only recomputed if
+    the rotation actually changed.
     """
 
+    __slots__ = ("pitch", "yaw", "roll", "_forward", "_right", "_up", "_matrix")
+
     def __init__(self, rotation):
+        self.pitch = self.yaw = self.roll = None
+        self.update(rotation)
+
+    def update(self, rotation) -> bool:
+        """Set a new rotation, given as an RLBot `Rotator` or as a `Vec3` of
+        (yaw, roll, pitch). Returns False (and keeps the cached matrix) if the rotation
+        is the same as before.
+        """
         if isinstance(rotation, Vec3):
-            self.yaw, self.roll, self.pitch = rotation
+            yaw, roll, pitch = rotation.x, rotation.y, rotation.z
         else:
-            self.yaw = float(rotation.yaw)
-            self.roll = float(rotation.roll)
-            self.pitch = float(rotation.pitch)
-
+            yaw, roll, pitch = rotation.yaw, rotation.roll, rotation.pitch
+        if yaw == self.yaw and roll == self.roll and pitch == self.pitch:
+            return False
+        self.yaw, self.roll, self.pitch = float(yaw), float(roll), float(pitch)
+        self._forward = self._right = self._up = self._matrix = None
+        return True
+
+    def _compute(self):
         cr = math.cos(self.roll)
         sr = math.sin(self.roll)
         cp = math.cos(self.pitch)
@@ -202,11 +485,85 @@ class Orientation:
         cy = math.cos(self.yaw)
         sy = math.sin(self.yaw)
 
-        self.forward: Vec3 = Vec3(cp * cy, cp * sy, sp)
-        self.right: Vec3 = Vec3(
-            cy * sp * sr - cr * sy, sy * sp * sr + cr * cy, -cp * sr
+        self._forward = _vec3(cp * cy, cp * sy, sp)
+        self._right = _vec3(cy * sp * sr - cr * sy, sy * sp * sr + cr * cy, -cp * sr)
+        self._up = _vec3(-cr * cy * sp - sr * sy, -cr * sy * sp + sr * cy, cp * cr)
+
+    @property
+    def forward(self) -> Vec3:
+        if self._forward is None:
+            self._compute()
+        return self._forward
+
+    @forward.setter
+    def forward(self, value: Vec3):
+        self._override("_forward", value)
+
+    @property
+    def right(self) -> Vec3:
+        if self._forward is None:
+            self._compute()
+        return self._right
+
+    @right.setter
+    def right(self, value: Vec3):
+        self._override("_right", value)
+
+    @property
+    def up(self) -> Vec3:
+        if self._forward is None:
+            self._compute()
+        return self._up
+
+    @up.setter
+    def up(self, value: Vec3):
+        self._override("_up", value)
+
+    def _override(self, name: str, value: Vec3):
+        """Replace one of the basis vectors, e.g. to define a custom frame such as the
+        field's. The other two are computed first so they stay available."""
+        if self._forward is None:
+            self._compute()
+        setattr(self, name, value)
+        self._matrix = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The 3x3 rotation matrix, with `forward`, `right` and `up` as its columns.
+        Multiplying it by local coordinates gives world coordinates."""
+        if self._matrix is None:
+            f, r, u = self.forward, self.right, self.up
+            self._matrix = np.array(((f.x, r.x, u.x), (f.y, r.y, u.y), (f.z, r.z, u.z)))
+        return self._matrix
+
+    def to_local(self, vec: Vec3) -> Vec3:
+        """Convert a world-space vector (e.g. the offset from a car to the ball) to
+        local coordinates: (forward, right, up) components."""
+        f, r, u = self.forward, self.right, self.up
+        x, y, z = vec.x, vec.y, vec.z
+        return _vec3(
+            x * f.x + y * f.y + z * f.z,
+            x * r.x + y * r.y + z * r.z,
+            x * u.x + y * u.y + z * u.z,
         )
-        self.up: Vec3 = Vec3(-cr * cy * sp - sr * sy, -cr * sy * sp + sr * cy, cp * cr)
+
+    def to_world(self, vec: Vec3) -> Vec3:
+        """Convert local (forward, right, up) coordinates to a world-space vector."""
+        f, r, u = self.forward, self.right, self.up
+        x, y, z = vec.x, vec.y, vec.z
+        return _vec3(
+            x * f.x + y * r.x + z * u.x,
+            x * f.y + y * r.y + z * u.y,
+            x * f.z + y * r.z + z * u.z,
+        )
+
+    def to_local_many(self, vecs: Vec3Array) -> Vec3Array:
+        """Vectorized `to_local` for many world-space vectors at once."""
+        return Vec3Array(vecs.data @ self.matrix)
+
+    def to_world_many(self, vecs: Vec3Array) -> Vec3Array:
+        """Vectorized `to_world` for many local vectors at once."""
+        return Vec3Array(vecs.data @ self.matrix.T)
 
 
 def angle_diff(a1: float, a2: float) -> float:
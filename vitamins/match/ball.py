@@ -20,15 +20,33 @@ class Ball(OrientedObject):
         self.velocity: Vec3 = Vec3()
         self.angular_velocity = Vec3()
         self.time = time
-        self.update(packet, phys)
+        if packet is not None or phys is not None:
+            self.update(packet, phys)
+
+    @classmethod
+    def from_state(
+        cls,
+        position: Vec3,
+        velocity: Vec3,
+        angular_velocity: Vec3 = None,
+        time: float = 0,
+    ) -> "Ball":
+        """Create a (hypothetical) ball from vectors rather than an RLBot struct."""
+        ball = cls(time=time)
+        ball.x, ball.y, ball.z = position.x, position.y, position.z
+        ball.velocity = velocity
+        if angular_velocity is not None:
+            ball.angular_velocity = angular_velocity
+        return ball
 
     def update(self, packet: GameTickPacket = None, phys=None):
         if packet is not None:
             self.latest_touch = packet.game_ball.latest_touch
             phys = packet.game_ball.physics
-        self.position = Vec3(phys.location)
-        self.velocity = Vec3(phys.velocity)
-        self.angular_velocity = Vec3(phys.angular_velocity)
+        location = phys.location
+        self.x, self.y, self.z = location.x, location.y, location.z
+        self.velocity = Vec3.from_struct(phys.velocity)
+        self.angular_velocity = Vec3.from_struct(phys.angular_velocity)
         if self.z - self.radius < 2:
             self.roll_counter += 1
         else:
@@ -43,3 +61,47 @@ class Ball(OrientedObject):
     def on_ground(self) -> bool:
         """Returns True if the ball is on the ground."""
         return self.z - self.radius < 1
+
+
+class BallView(Ball):
+    """A `Ball` that reads its state straight out of the packet, like `CarView`.
+    The location is copied on `update`; velocity and angular velocity are
+    materialized on first access in each tick.
+    """
+
+    _physics = None
+    _velocity: Vec3 = None
+    _angular_velocity: Vec3 = None
+
+    def update(self, packet: GameTickPacket = None, phys=None):
+        if packet is not None:
+            self.latest_touch = packet.game_ball.latest_touch
+            phys = packet.game_ball.physics
+        self._physics = phys
+        location = phys.location
+        self.x, self.y, self.z = location.x, location.y, location.z
+        self._velocity = self._angular_velocity = None
+        if self.z - self.radius < 2:
+            self.roll_counter += 1
+        else:
+            self.roll_counter = 0
+
+    @property
+    def velocity(self) -> Vec3:
+        if self._velocity is None:
+            self._velocity = Vec3.from_struct(self._physics.velocity)
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value: Vec3):
+        self._velocity = value
+
+    @property
+    def angular_velocity(self) -> Vec3:
+        if self._angular_velocity is None:
+            self._angular_velocity = Vec3.from_struct(self._physics.angular_velocity)
+        return self._angular_velocity
+
+    @angular_velocity.setter
+    def angular_velocity(self, value: Vec3):
+        self._angular_velocity = value
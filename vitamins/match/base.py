@@ -19,7 +19,7 @@ class Location(Vec3):
 
     @property
     def position(self) -> Vec3:
-        return Vec3(self.x, self.y, self.z)
+        return Vec3.from_vec(self)
 
     @position.setter
     def position(self, value: Vec3):
@@ -59,15 +59,26 @@ class Location(Vec3):
     def __mul__(self, scale: float) -> "Location":
         return Location(position=self.position * scale, velocity=self.velocity * scale)
 
+    __rmul__ = __mul__
+
+    # `Vec3` mutates itself for `+=`, `-=` and `*=`, which would leave the velocity
+    # untouched. Locations keep the out-of-place semantics instead.
+    def __iadd__(self, other) -> "Location":
+        return self + other
+
+    def __isub__(self, other) -> "Location":
+        return self - other
+
+    def __imul__(self, scale: float) -> "Location":
+        return self * scale
+
     def __truediv__(self, scale: float) -> "Location":
         return self * (1 / float(scale))
 
     def to(self, other) -> Vec3:
         """Returns the `Vec3` from `self` to `other`, i.e. the relative position."""
-        if hasattr(other, "position"):
-            return other.position - self.position
-        else:
-            return other - self.position
+        # Works for both `Location` and plain `Vec3`, without copying either one:
+        return Vec3.__sub__(other, self)
 
     def flat(self) -> "Location":
         """Returns a copy of the Location with position and velocity projected onto
@@ -206,7 +217,7 @@ class OrientedObject(Location):
         maximum pitch rate of 5.5 radians/sec. A positive value for a car would mean it
         was raising its nose up (turning clockwise viewed from the left).
         """
-        return self.angular_velocity.dot(-self.orientation.right)
+        return -self.angular_velocity.dot(self.orientation.right)
 
     @property
     def roll_rate(self) -> float:
@@ -214,7 +225,7 @@ class OrientedObject(Location):
         maximum roll rate of 5.5 radians/sec. A positive value for a car would mean it
         was rolling to the right (turning clockwise viewed from behind).
         """
-        return self.angular_velocity.dot(-self.orientation.forward)
+        return -self.angular_velocity.dot(self.orientation.forward)
 
     def yaw_to(self, other: Vec3) -> float:
         """Returns the yaw angle from the object's forward vector to the given location
@@ -223,10 +234,9 @@ class OrientedObject(Location):
         of the object's orientation, e.g. a car driving on the wall or flying upside-
         down. A positive value means the car needs to turn right, negative means left.
         """
-        ovec = self.to(other)
-        ox = ovec.dot(self.left)
-        oy = ovec.dot(self.forward)
-        return -math.atan2(ox, oy)
+        local = self.orientation.to_local(self.to(other))
+        # -atan2(left, forward), without building the `left` vector:
+        return math.atan2(local.y, local.x)
 
     @property
     def forward_speed(self) -> float:
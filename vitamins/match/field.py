@@ -3,7 +3,7 @@ from typing import List
 
 from rlbot.utils.structures.game_data_struct import FieldInfoPacket, GameTickPacket
 
-from vitamins.geometry import Vec3, Orientation
+from vitamins.geometry import Vec3, Vec3Array, Orientation
 from vitamins.match.base import Location, OrientedObject
 
 
@@ -44,6 +44,8 @@ class Field(OrientedObject):
     boosts: List[BoostPickup]
     big_boosts: List[BoostPickup]
     little_boosts: List[BoostPickup]
+    boost_locations: Vec3Array
+    big_boost_locations: Vec3Array
     boostBL: BoostPickup
     boostBR: BoostPickup
     boostML: BoostPickup
@@ -84,6 +86,9 @@ class Field(OrientedObject):
             self.boosts.append(BoostPickup(boost.location, i, boost.is_full_boost))
         self.big_boosts = [b for b in self.boosts if b.is_big]
         self.little_boosts = [b for b in self.boosts if not b.is_big]
+        # The pads never move, so keep their locations around for vectorized searches:
+        self.boost_locations = Vec3Array.from_vecs(self.boosts)
+        self.big_boost_locations = Vec3Array.from_vecs(self.big_boosts)
         for b in self.big_boosts:
             x = b.dot(self.left)
             y = b.dot(self.forward)
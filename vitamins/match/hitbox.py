@@ -84,7 +84,9 @@ class Hitbox:
         """
         corner_str = corner_str.upper()
         # todo: take angular velocity into account, too:
-        pos = self.car.position + dt * self.car.velocity
+        pos = self.car.position
+        if dt:
+            pos += dt * self.car.velocity
         if "F" in corner_str:
             pos += self._fwd
         if "B" in corner_str:
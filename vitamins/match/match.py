@@ -1,14 +1,17 @@
 """vitamins.match.match -- Class for representing the current match."""
-from typing import List
+from typing import List, Optional
 
 from rlbot.agents.base_agent import BaseAgent
 from rlbot.utils.structures.game_data_struct import GameTickPacket
 
-from vitamins import draw
-from vitamins.match.ball import Ball
-from vitamins.match.car import Car
+from vitamins import cache, draw
+from vitamins.match.ball import Ball, BallView
+from vitamins.match.car import Car, CarView
 from vitamins.match.field import Field
 from vitamins.match.prediction import BallPredictor
+from vitamins.profiler import TickProfiler
+from vitamins.recorder import Recorder
+from vitamins.util import perf_counter_ns
 
 
 class MatchAgent(BaseAgent):
@@ -58,34 +61,70 @@ class Match:
     teammates: List[Car] = []
     opponents: List[Car] = []
     info: dict = {}  # Place to store misc. stuff
+    # If True, cars and ball are `CarView`/`BallView`, which read from the packet
+    # lazily. Must be set before `initialize`.
+    packet_views: bool = False
+    # Set to a `TickProfiler` to time each phase of every tick:
+    profiler: Optional[TickProfiler] = None
+    # Set to a `Recorder` to save every packet and ball prediction to a file:
+    recorder: Optional[Recorder] = None
 
     @classmethod
     def initialize(cls, agent: MatchAgent, packet: GameTickPacket):
         cls.agent = agent
         draw.set_renderer(agent.renderer)
         cls.field = Field(agent.team, agent.get_field_info())
-        cls.cars = [Car(index=i, packet=packet) for i in range(packet.num_cars)]
+        car_class = CarView if cls.packet_views else Car
+        cls.cars = [car_class(index=i, packet=packet) for i in range(packet.num_cars)]
         cls.agent_car = cls.cars[cls.agent.index]
         cls.teammates = [car for car in cls.cars if car.team == cls.agent.team]
         cls.opponents = [car for car in cls.cars if car.team != cls.agent.team]
         if cls.opponents:
             cls.opponent_car = cls.opponents[0]
-        cls.ball = Ball(packet=packet)
+        cls.ball = (BallView if cls.packet_views else Ball)(packet=packet)
         cls.current_prediction = BallPredictor(agent.get_ball_prediction_struct)
         cls.update(packet)
 
     @classmethod
-    def update(cls, packet: GameTickPacket):
+    def reset(cls):
+        """Forget the current match, so that another agent can be initialized in the
+        same process. Settings (`packet_views`, `profiler`, `recorder`) are kept."""
+        cls.agent = None
+        cls.time = 0
+        cls.tick = 0
+        cls.current_prediction = None
+        cls.agent_car = None
+        cls.opponent_car = None
+        cls.field = None
+        cls.ball = None
+        cls.cars = []
+        cls.teammates = []
+        cls.opponents = []
+        cls.info = {}
+
+    @classmethod
+    def update(cls, packet: GameTickPacket, analytics: bool = True):
+        """Update everything from the new packet. With `analytics` False, values derived
+        from the ball prediction (like `on_goal`) are left as they were last tick."""
         cls.packet = packet
         cls.time = packet.game_info.seconds_elapsed
         cls.tick += 1
+        cache.new_tick(cls.tick)
         for car in cls.cars:
             car.update(packet=packet)
         cls.ball.update(packet=packet)
         cls.field.update(packet=packet)
-        cls.current_prediction.update(packet=packet)
+        if cls.profiler is None:
+            cls.current_prediction.update(packet=packet, analytics=analytics)
+        else:
+            start = perf_counter_ns()
+            cls.current_prediction.update(packet=packet, analytics=analytics)
+            cls.profiler.since("predictor", start)
+        if cls.recorder is not None:
+            cls.recorder.record(packet, cls.current_prediction.prediction)
 
     @classmethod
+    @cache.per_tick()
     def predict_ball(cls, dt: float = 0) -> Ball:
         if cls.current_prediction is None:
             return cls.ball
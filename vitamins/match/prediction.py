@@ -1,68 +1,483 @@
 """vitamins.match.prediction -- routines for predicting the future."""
-from typing import Callable, List
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import ctypes
+import math
 
-from rlbot.utils.structures.game_data_struct import GameTickPacket
-from rlbot.utils.structures.ball_prediction_struct import BallPrediction
+import numpy as np
+from rlbot.utils.structures.game_data_struct import GameTickPacket, Physics
+from rlbot.utils.structures.ball_prediction_struct import BallPrediction, Slice
 
 from vitamins.match.ball import Ball
-from vitamins.geometry import Vec3
+from vitamins.match.field import Field
+from vitamins.geometry import Vec3, Vec3Array
 from vitamins import draw
 from vitamins.math import clamp
 
+# Column layout of a `Slice` viewed as a row of float32 values:
+_SLICE_FLOATS = ctypes.sizeof(Slice) // 4
+_LOCATION = (Slice.physics.offset + Physics.location.offset) // 4
+_VELOCITY = (Slice.physics.offset + Physics.velocity.offset) // 4
+_ANGULAR_VELOCITY = (Slice.physics.offset + Physics.angular_velocity.offset) // 4
+_TIME = Slice.game_seconds.offset // 4
+
+# Slice times are float32, so allow for rounding when comparing them:
+_TIME_EPSILON = 1e-4
+
+
+class PredictedSlices(NamedTuple):
+    """The result of `BallPredictor.predict_many`: one entry per requested time."""
+
+    time: np.ndarray
+    position: Vec3Array
+    velocity: Vec3Array
+    angular_velocity: Vec3Array
+
+
+class _EventIndex:
+    """Sorted slice numbers and times of one kind of event, complete up to (but not
+    including) slice number `upto`."""
+
+    def __init__(self, upto: int):
+        self.slices: List[int] = []
+        self.times: List[float] = []
+        self.upto = upto
+
 
 class BallPredictor:
     ready: bool = True
     valid: bool = True
     max_bounces: int = 5
-    bounce_threshold: float = 300
-    on_goal: List[bool] = [False, False]
+    bounce_threshold: float = 300  # change in velocity that counts as a bounce
+    ground_margin: float = 10  # how close to the ground (or z level) counts as touching
+    wall_margin: float = 10  # how close to a wall counts as touching
+    # While nobody touches the ball, a new prediction is taken to be the old one moved
+    # forward in time if its first slice is within `shift_time_tolerance` of an old
+    # slice (RLBot's slices are 1/60 s apart, but the bot ticks at 120 Hz), and at
+    # `shift_samples` of its slices, it's within `shift_position_tolerance` of where
+    # the old path puts the ball at that time:
+    shift_time_tolerance: float = 1 / 120
+    shift_position_tolerance: float = 5.0
+    shift_samples: int = 4
 
     def __init__(self, prediction_function: Callable[[], BallPrediction]):
         self.prediction_function = prediction_function
+        self.game_time = 0.0
+        self.num_slices = 0
+        # The slices live in a preallocated buffer, from row `_start` on, and `data`
+        # and `times` are views of them. A shift moves the start along and writes the
+        # new tail after the end; when that runs out of room, the rows still in the
+        # path are moved back to the front.
+        self._buffer = np.zeros((0, _SLICE_FLOATS))
+        self._time_buffer = np.zeros(0)
+        self._time_list: List[float] = []  # the same times, for bisecting on scalars
+        self._start = 0
+        self.data = self._buffer
+        self.times = self._time_buffer
+        # Slices are numbered absolutely: local index 0 is slice number `base`. When
+        # the prediction is only shifted in time, `base` advances and everything keyed
+        # on slice numbers (cached balls, event indexes) stays valid.
+        self.base = 0
+        self._balls: Dict[int, Ball] = {}
+        self._events: Dict[str, _EventIndex] = {}
+        self._touch = None
+        self.rebuilds = 0
+        self.shifts = 0
+        self._window_start = 0.0
+        self._window_counts = [0, 0]
+        self._rates = (0.0, 0.0)
+        # Per team, whether the predicted path goes into that team's goal, and when
+        # and where it crosses the goal line:
+        self.on_goal: List[bool] = [False, False]
+        self.goal_time: List[Optional[float]] = [None, None]
+        self.goal_point: List[Optional[Vec3]] = [None, None]
+        # Slice numbers of those crossings (-1 if none), and the slice number up to
+        # which the path has been checked for them, or None if it hasn't been since
+        # the last rebuild:
+        self._goal_slices = [-1, -1]
+        self._goals_upto: Optional[int] = None
 
-    def update(self, packet: GameTickPacket):
+    def update(self, packet: GameTickPacket, analytics: bool = True):
         self.game_time = packet.game_info.seconds_elapsed
         self.prediction = self.prediction_function()
+        n = self.prediction.num_slices
+        raw = np.frombuffer(self.prediction.slices, dtype=np.float32)
+        raw = raw.reshape(-1, _SLICE_FLOATS)[:n]
+        if n == 0:
+            # No prediction (at startup, or between matches): stand in the ball as it
+            # is now, so every query still has a slice to answer from.
+            raw = self._current_ball_row(packet)
+        touch = packet.game_ball.latest_touch
+        touch = (touch.time_seconds, touch.player_index)
+        shift = self._continuation(raw) if touch == self._touch else None
+        self._touch = touch
+        if shift is None:
+            self._rebuild(raw)
+        else:
+            self._shift(raw, *shift)
+        self._count_refresh(shift is None)
+        if analytics:
+            self._update_goals()
 
-    def predict(self, dt: float) -> Ball:
-        """Return a Ball instance predicted `dt` match seconds into the future."""
-        coarse_scan = 16  # step size for initial scan of slices
-        t = clamp(
-            self.game_time + dt,
-            self.prediction.slices[0].game_seconds,
-            self.prediction.slices[self.prediction.num_slices - 1].game_seconds,
-        )
-        index = 0
-        for index in range(0, self.prediction.num_slices - coarse_scan, coarse_scan):
-            if self.prediction.slices[index + coarse_scan].game_seconds > t:
-                break
-        while (
-            index + 1 < self.prediction.num_slices
-            and self.prediction.slices[index].game_seconds <= t
+    def _current_ball_row(self, packet: GameTickPacket) -> np.ndarray:
+        row = np.zeros((1, _SLICE_FLOATS), dtype=np.float32)
+        physics = packet.game_ball.physics
+        for column, vector in (
+            (_LOCATION, physics.location),
+            (_VELOCITY, physics.velocity),
+            (_ANGULAR_VELOCITY, physics.angular_velocity),
         ):
-            index += 1
-        phys = self.prediction.slices[index].physics
-        return Ball(phys=phys, time=self.prediction.slices[index].game_seconds)
+            row[0, column : column + 3] = (vector.x, vector.y, vector.z)
+        row[0, _TIME] = self.game_time
+        return row
 
-    def next_bounce(self, game_time: float = 0) -> Ball:
-        """Return the first bounce after the specified match time. If there is no bounce
-        in the predicted ball path, return the last predicted moment.
+    def _continuation(self, raw: np.ndarray) -> Optional[Tuple[int, int]]:
+        """If the new prediction is the old one moved forward in time, return how many
+        old slices have expired, and the index in `raw` of the first slice past the
+        end of the old path. Otherwise return None.
         """
-        # Todo: this is worth optimizing (tested)
-        for i in range(1, self.prediction.num_slices):
-            dv = Vec3(self.prediction.slices[i].physics.velocity) - Vec3(
-                self.prediction.slices[i - 1].physics.velocity
+        old_n, n = self.num_slices, len(raw)
+        if old_n < 2 or n < old_n:
+            return None
+        times, lo = self._time_list, self._start
+        hi = lo + old_n
+        # The first old slice that's still ahead must be on the new grid, give or take:
+        start = float(raw[0, _TIME])
+        first = bisect_left(times, start - _TIME_EPSILON, lo, hi)
+        if (
+            first == hi
+            or times[first] - start > self.shift_time_tolerance + _TIME_EPSILON
+        ):
+            return None
+        if hi - first < old_n // 2:
+            return None
+        # Slices more than half a slice past the old end are new. One that's only half
+        # a slice past it, as on every other tick at 120 Hz, is left off, so the path
+        # stays on the old grid:
+        last = times[hi - 1] + 0.75 * (times[hi - 1] - times[hi - 2])
+        tail = n
+        while tail > 0 and raw[tail - 1, _TIME] > last:
+            tail -= 1
+        if tail == 0 or hi - first + n - tail > len(self._buffer):
+            return None
+        # Both paths must agree at a few of the slices they share. The new slices are
+        # `offset` seconds off the old ones, so move those along by their velocity.
+        # There are only a few, so this is quicker in Python than in numpy.
+        offset = start - times[first]
+        shared = min(tail, hi - first)
+        if (
+            abs(raw[shared - 1, _TIME] - times[first + shared - 1] - offset)
+            > _TIME_EPSILON
+        ):
+            return None  # the slices aren't spaced the same
+        step = max(shared // self.shift_samples, 1)
+        old = self.data[first - lo : first - lo + shared : step]
+        tolerance = self.shift_position_tolerance
+        for new_p, old_p, old_v in zip(
+            raw[:shared:step, _LOCATION : _LOCATION + 3].tolist(),
+            old[:, _LOCATION : _LOCATION + 3].tolist(),
+            old[:, _VELOCITY : _VELOCITY + 3].tolist(),
+        ):
+            for new_x, old_x, old_vx in zip(new_p, old_p, old_v):
+                if abs(new_x - old_x - offset * old_vx) > tolerance:
+                    return None
+        return first - lo, tail
+
+    def _rebuild(self, raw: np.ndarray):
+        """Replace the whole prediction and throw away everything derived from it."""
+        n = len(raw)
+        if len(self._buffer) < 2 * n:
+            # Room for the path to be shifted along by as many slices as it has:
+            self._buffer = np.empty((2 * n, _SLICE_FLOATS))
+            self._time_buffer = np.empty(2 * n)
+        # One copy of the whole struct into contiguous float64 columns; every query
+        # works on these arrays instead of the ctypes slices.
+        self._buffer[:n] = raw
+        self._time_buffer[:n] = self._buffer[:n, _TIME]
+        self._time_list = self._time_buffer[:n].tolist()
+        self._set_view(0, n)
+        self._balls.clear()
+        self._events.clear()
+        self._goals_upto = None
+
+    def _shift(self, raw: np.ndarray, expired: int, tail: int):
+        """Drop `expired` slices from the front, and append the slices of `raw` from
+        `tail` on, keeping cached balls and event indexes for the slices still in the
+        path."""
+        start = self._start + expired
+        end = self._start + self.num_slices
+        new = raw[tail:]
+        k = len(new)
+        if end + k > len(self._buffer):
+            kept = end - start
+            self._buffer[:kept] = self._buffer[start:end]
+            self._time_buffer[:kept] = self._time_buffer[start:end]
+            self._time_list[:kept] = self._time_list[start:end]
+            start, end = 0, kept
+        if k:
+            self._buffer[end : end + k] = new
+            self._time_buffer[end : end + k] = self._buffer[end : end + k, _TIME]
+            self._time_list[end : end + k] = self._time_buffer[end : end + k].tolist()
+        self._set_view(start, end + k - start)
+        if expired:
+            self.base += expired
+            if self._balls:
+                self._balls = {i: b for i, b in self._balls.items() if i >= self.base}
+
+    def _set_view(self, start: int, n: int):
+        self._start = start
+        self.num_slices = n
+        self.data = self._buffer[start : start + n]
+        self.times = self._time_buffer[start : start + n]
+
+    def _count_refresh(self, rebuilt: bool):
+        if rebuilt:
+            self.rebuilds += 1
+        else:
+            self.shifts += 1
+        self._window_counts[0 if rebuilt else 1] += 1
+        elapsed = self.game_time - self._window_start
+        if elapsed >= 1 or elapsed < 0:
+            if elapsed > 0:
+                rebuilds, shifts = self._window_counts
+                self._rates = (rebuilds / elapsed, shifts / elapsed)
+            self._window_start = self.game_time
+            self._window_counts = [0, 0]
+
+    def refresh_stats(self) -> Dict[str, float]:
+        """How often the prediction had to be rebuilt, versus cheaply shifted. The
+        rates are per game second, measured over the last full second."""
+        return {
+            "rebuilds": self.rebuilds,
+            "shifts": self.shifts,
+            "rebuilds_per_sec": self._rates[0],
+            "shifts_per_sec": self._rates[1],
+        }
+
+    def _update_goals(self):
+        """Work out `on_goal`, `goal_time` and `goal_point`. While the path is only
+        shifted, a crossing that's still ahead stays as it was (its time is a match
+        time, so it doesn't move), and otherwise just the new slices are checked."""
+        end = self.base + self.num_slices
+        for team in (0, 1):
+            if self._goals_upto is not None:
+                crossing = self._goal_slices[team]
+                if crossing >= self.base:
+                    continue
+                if crossing < 0 and self._goals_upto == end:
+                    continue
+            self._update_goal(team)
+        self._goals_upto = end
+
+    def _update_goal(self, team: int):
+        index = self.next_event(f"goal:{team}", self.game_time)
+        self.on_goal[team] = index >= 0
+        if index < 0:
+            self._goal_slices[team] = -1
+            self.goal_time[team] = self.goal_point[team] = None
+            return
+        self._goal_slices[team] = self.base + index
+        if index == 0:
+            # The slice before it has expired, so there's nothing to interpolate with:
+            row = self.data[0].tolist()
+            self.goal_time[team] = row[_TIME]
+            self.goal_point[team] = Vec3(*row[_LOCATION : _LOCATION + 3])
+            return
+        # Interpolate between the slices on either side of the goal line:
+        before, after = self.data[index - 1], self.data[index]
+        goal_line = -Field.to_end_wall if team == 0 else Field.to_end_wall
+        y0, y1 = before[_LOCATION + 1], after[_LOCATION + 1]
+        frac = (goal_line - y0) / (y1 - y0)
+        row = (before + frac * (after - before)).tolist()
+        self.goal_time[team] = row[_TIME]
+        self.goal_point[team] = Vec3(*row[_LOCATION : _LOCATION + 3])
+
+    def time_to_goal(self, team: int) -> float:
+        """Seconds until the predicted ball crosses the goal line into the given team's
+        goal, or infinity if it doesn't."""
+        if self.goal_time[team] is None:
+            return math.inf
+        return self.goal_time[team] - self.game_time
+
+    @property
+    def positions(self) -> np.ndarray:
+        """(N, 3) array of predicted ball locations, one row per slice."""
+        return self.data[:, _LOCATION : _LOCATION + 3]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        """(N, 3) array of predicted ball velocities, one row per slice."""
+        return self.data[:, _VELOCITY : _VELOCITY + 3]
+
+    @property
+    def angular_velocities(self) -> np.ndarray:
+        """(N, 3) array of predicted ball angular velocities, one row per slice."""
+        return self.data[:, _ANGULAR_VELOCITY : _ANGULAR_VELOCITY + 3]
+
+    def slice_ball(self, index: int) -> Ball:
+        """Return the predicted ball at slice `index`. Balls are cached for as long
+        as their slice stays in the path, so don't modify the returned object.
+        """
+        key = self.base + index
+        ball = self._balls.get(key)
+        if ball is None:
+            row = self.data[index].tolist()
+            ball = Ball.from_state(
+                position=Vec3(*row[_LOCATION : _LOCATION + 3]),
+                velocity=Vec3(*row[_VELOCITY : _VELOCITY + 3]),
+                angular_velocity=Vec3(*row[_ANGULAR_VELOCITY : _ANGULAR_VELOCITY + 3]),
+                time=row[_TIME],
             )
-            if i + 1 == self.prediction.num_slices or (
-                self.prediction.slices[i].game_seconds > game_time
-                and dv.length() > self.bounce_threshold
-            ):
-                ball = Ball(
-                    phys=self.prediction.slices[i].physics,
-                    time=self.prediction.slices[i].game_seconds,
+            self._balls[key] = ball
+        return ball
+
+    def predict(self, dt: float, interpolate: bool = False) -> Ball:
+        """Return a Ball instance predicted `dt` match seconds into the future.
+
+        By default this is the first predicted slice after that moment. If
+        `interpolate` is True, the ball is instead interpolated linearly between the
+        slices on either side, for sub-slice accuracy.
+        """
+        times, lo = self._time_list, self._start
+        hi = lo + self.num_slices
+        t = clamp(self.game_time + dt, times[lo], times[hi - 1])
+        # Binary search. On scalars, bisect on a list beats np.searchsorted.
+        i = min(bisect_right(times, t, lo, hi), hi - 1)
+        index = i - lo
+        if not interpolate or index == 0 or times[i] <= t:
+            return self.slice_ball(index)
+        frac = (t - times[i - 1]) / (times[i] - times[i - 1])
+        row = self.data[index - 1] + frac * (self.data[index] - self.data[index - 1])
+        row = row.tolist()
+        return Ball.from_state(
+            position=Vec3(*row[_LOCATION : _LOCATION + 3]),
+            velocity=Vec3(*row[_VELOCITY : _VELOCITY + 3]),
+            angular_velocity=Vec3(*row[_ANGULAR_VELOCITY : _ANGULAR_VELOCITY + 3]),
+            time=t,
+        )
+
+    def predict_many(
+        self, dts: Sequence[float], interpolate: bool = False
+    ) -> PredictedSlices:
+        """Vectorized `predict` for many times at once. Returns arrays with one entry
+        per element of `dts`, rather than a `Ball` for each.
+        """
+        times = self.times
+        t = np.clip(
+            self.game_time + np.asarray(dts, dtype=np.float64), times[0], times[-1]
+        )
+        index = np.minimum(np.searchsorted(times, t, side="right"), self.num_slices - 1)
+        if interpolate:
+            lo = np.maximum(index - 1, 0)
+            span = times[index] - times[lo]
+            frac = np.where(span > 0, (t - times[lo]) / np.where(span > 0, span, 1), 0)
+            frac = np.where(times[index] <= t, 1, frac)
+            rows = self.data[lo] + frac[:, None] * (self.data[index] - self.data[lo])
+            out_time = t
+        else:
+            rows = self.data[index]
+            out_time = rows[:, _TIME]
+        return PredictedSlices(
+            time=out_time,
+            position=Vec3Array(rows[:, _LOCATION : _LOCATION + 3]),
+            velocity=Vec3Array(rows[:, _VELOCITY : _VELOCITY + 3]),
+            angular_velocity=Vec3Array(
+                rows[:, _ANGULAR_VELOCITY : _ANGULAR_VELOCITY + 3]
+            ),
+        )
+
+    def _detect_events(self, kind: str, lo: int = 0) -> np.ndarray:
+        """Return the indices of all slices from `lo` on where an event of the given
+        kind happens. Kinds are "bounce", "wall", "apex", "ground" (optionally
+        followed by a z level, e.g. "ground:300.0"), or "goal:0" / "goal:1" (the ball
+        crosses the goal line into that team's goal, fully inside the goal mouth).
+        """
+        pos = self.positions[lo:]
+        vel = self.velocities[lo:]
+        if kind == "bounce":
+            dv = np.diff(vel, axis=0)
+            speed_change = np.sqrt(np.einsum("ij,ij->i", dv, dv))
+            found = np.flatnonzero(speed_change > self.bounce_threshold) + 1
+        elif kind == "wall":
+            margin = Ball.radius + self.wall_margin
+            near_wall = (np.abs(pos[:, 0]) + margin > Field.to_side_wall) | (
+                np.abs(pos[:, 1]) + margin > Field.to_end_wall
+            )
+            found = np.flatnonzero(near_wall)
+        elif kind == "apex":
+            vz = vel[:, 2]
+            found = np.flatnonzero((vz[:-1] > 0) & (vz[1:] <= 0)) + 1
+        elif kind.startswith("ground"):
+            z = float(kind[7:] or 0)
+            found = np.flatnonzero(pos[:, 2] - Ball.radius - z < self.ground_margin)
+        elif kind in ("goal:0", "goal:1"):
+            # Team 0 defends the goal at negative y:
+            y = pos[:, 1] if kind == "goal:1" else -pos[:, 1]
+            if len(y) < 2 or y.max() < Field.to_end_wall:
+                # Nowhere near the goal line, as on most ticks:
+                found = np.zeros(0, dtype=np.intp)
+            else:
+                crossing = (y[:-1] < Field.to_end_wall) & (y[1:] >= Field.to_end_wall)
+                in_mouth = (np.abs(pos[1:, 0]) < Field.goal_width / 2 - Ball.radius) & (
+                    pos[1:, 2] < Field.goal_height - Ball.radius
                 )
-                ball.dv = dv
-                return ball
+                found = np.flatnonzero(crossing & in_mouth) + 1
+        else:
+            raise ValueError(f"Unknown event kind: {kind}")
+        return found + lo
+
+    def events(self, kind: str) -> Tuple[List[int], List[float]]:
+        """Return the (absolute slice numbers, times) of every event of the given kind
+        in the current prediction, both sorted by time. See `_detect_events` for the
+        kinds. Subtract `base` from a slice number to get its index in the arrays.
+
+        The index is built on first use. When the prediction is only shifted in time,
+        it is kept, and just the newly predicted slices are scanned.
+        """
+        index = self._events.get(kind)
+        if index is None:
+            index = self._events[kind] = _EventIndex(self.base)
+        end = self.base + self.num_slices
+        if index.upto < end:
+            # Start one slice early, so events defined between a pair of slices
+            # (bounces, apexes) are found at the boundary too:
+            lo = max(index.upto - self.base - 1, 0)
+            found = self._detect_events(kind, lo) + self.base
+            found = found[found >= index.upto]
+            index.slices.extend(found.tolist())
+            index.times.extend(self.times[found - self.base].tolist())
+            index.upto = end
+        # Drop events that have shifted out of the path. One found between a slice
+        # that has expired and the first slice is still ahead, so it stays.
+        if index.slices and index.slices[0] < self.base:
+            expired = bisect_left(index.slices, self.base)
+            del index.slices[:expired], index.times[:expired]
+        return index.slices, index.times
+
+    def next_event(self, kind: str, game_time: float = 0) -> int:
+        """Return the slice index of the first event of the given kind after the
+        specified match time, or -1 if there isn't one."""
+        slices, times = self.events(kind)
+        i = bisect_right(times, game_time)
+        return slices[i] - self.base if i < len(slices) else -1
+
+    def _event_ball(self, index: int) -> Ball:
+        """The ball at a slice returned by `next_event`. If there was no event (-1),
+        that's the last predicted moment."""
+        if index < 0:
+            index = self.num_slices - 1
+        return self.slice_ball(index)
+
+    def next_bounce(self, game_time: float = 0) -> Ball:
+        """Return the first bounce after the specified match time. If there is no bounce
+        in the predicted ball path, return the last predicted moment. The change in
+        velocity at the bounce is stored in the returned ball's `dv` attribute.
+        """
+        index = self.next_event("bounce", game_time)
+        ball = self._event_ball(index)
+        i = index if index > 0 else self.num_slices - 1
+        ball.dv = Vec3(*(self.velocities[i] - self.velocities[i - 1]).tolist())
+        return ball
 
     def next_ground(self, game_time: float = 0, z: float = 0) -> Ball:
         """Return the first time the ball will touch the ground after the specified
@@ -70,22 +485,18 @@ class BallPredictor:
         last predicted moment. If `z` is given, returns the first time when the z level
         of the ball is lower than `z`.
         """
-        # Todo: this is worth optimizing (tested)
-        for i in range(self.prediction.num_slices):
-            if i + 1 == self.prediction.num_slices or (
-                self.prediction.slices[i].physics.location.z - Ball.radius - z < 10
-                and self.prediction.slices[i].game_seconds > game_time
-            ):
-                return Ball(
-                    phys=self.prediction.slices[i].physics,
-                    time=self.prediction.slices[i].game_seconds,
-                )
+        kind = f"ground:{float(z)!r}" if z else "ground"
+        return self._event_ball(self.next_event(kind, game_time))
+
+    def next_wall(self, game_time: float = 0) -> Ball:
+        """Return the first time the ball is touching a side or end wall after the
+        specified game time, or the last predicted moment."""
+        return self._event_ball(self.next_event("wall", game_time))
+
+    def next_apex(self, game_time: float = 0) -> Ball:
+        """Return the top of the ball's next arc after the specified game time, or the
+        last predicted moment."""
+        return self._event_ball(self.next_event("apex", game_time))
 
     def draw_path(self, path_color="white", step=4):
-        draw.polyline_3d(
-            [
-                self.prediction.slices[i].physics.location
-                for i in range(0, self.prediction.num_slices, step)
-            ],
-            color=path_color,
-        )
+        draw.polyline_3d(self.positions[::step].tolist(), color=path_color)
@@ -0,0 +1,166 @@
+"""The `vitamins.profiler` module breaks each tick's running time down by phase.
+
+Turn it on by giving `Match` a profiler, before or during the first tick:
+
+.. sourcecode:: python
+
+    from vitamins.match.match import Match
+    from vitamins.profiler import TickProfiler
+
+    Match.profiler = TickProfiler()
+
+The agent then times each phase of every tick: `match_update` (which includes
+`predictor`, the ball prediction refresh), `scoring` (with one `score:<task>` entry per
+task that was scored), `run` for the current task or action, `render`, and the whole
+`tick`. Nothing is printed. Call `summary()` or `report()` whenever you want to look:
+
+.. sourcecode:: python
+
+    print(Match.profiler.report())
+
+Each phase keeps a histogram of fixed size, so memory use doesn't grow however long the
+match runs, and recording a sample is a few integer operations. With `Match.profiler`
+left at None, the only cost is checking it for None.
+"""
+from typing import Dict, List, Tuple
+
+from vitamins.util import perf_counter_ns
+
+_SUB_BUCKETS = 8  # buckets per doubling of duration
+_NUM_BUCKETS = 256  # enough for durations up to about 17 seconds
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """Lowest and highest-plus-one duration (ns) counted in histogram bucket `index`."""
+    if index < 2 * _SUB_BUCKETS:
+        return index, index + 1
+    shift = index // _SUB_BUCKETS - 1
+    lower = (index % _SUB_BUCKETS + _SUB_BUCKETS) << shift
+    return lower, lower + (1 << shift)
+
+
+class Histogram:
+    """Histogram of durations in nanoseconds. Buckets are spaced logarithmically, eight
+    per doubling, so quantiles are accurate to within about 6%.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns: int):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        if ns < 2 * _SUB_BUCKETS:
+            index = max(ns, 0)
+        else:
+            # The top four bits of the duration pick the bucket within its octave:
+            shift = ns.bit_length() - 4
+            index = min((shift << 3) + (ns >> shift), _NUM_BUCKETS - 1)
+        self.counts[index] += 1
+
+    def quantile(self, q: float) -> float:
+        """Return the duration (ns) below which the fraction `q` of samples fall."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                lower, upper = _bucket_bounds(index)
+                return min((lower + upper) / 2, self.max)
+        return float(self.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class TickProfiler:
+    """Collects per-phase timing histograms, and counts ticks that run over the frame
+    budget.
+
+    :param startup: Number of initial ticks to ignore, so that start-up costs (imports,
+        first-time caching) don't skew the numbers.
+    """
+
+    budget_ms: float = 1000 / 120  # one frame at 120 Hz
+
+    def __init__(self, startup: int = 0):
+        self.startup = startup
+        self.histograms: Dict[str, Histogram] = {}
+        self.ticks = 0
+        self.over_budget = 0
+        self._tick_start = 0
+
+    def add(self, phase: str, ns: int):
+        """Record one sample of `ns` nanoseconds for `phase`."""
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = Histogram()
+        histogram.add(ns)
+
+    def since(self, phase: str, start: int) -> int:
+        """Record the time from `start` (a `perf_counter_ns` value) until now for
+        `phase`, and return the current time, so it can start the next phase."""
+        now = perf_counter_ns()
+        self.add(phase, now - start)
+        return now
+
+    def begin_tick(self):
+        self._tick_start = perf_counter_ns()
+
+    def end_tick(self):
+        if self.startup > 0:
+            self.startup -= 1
+            self.histograms.clear()
+            return
+        ns = perf_counter_ns() - self._tick_start
+        self.add("tick", ns)
+        self.ticks += 1
+        if ns > self.budget_ms * 1e6:
+            self.over_budget += 1
+
+    def reset(self):
+        self.histograms.clear()
+        self.ticks = self.over_budget = 0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return statistics for each phase, in milliseconds, the most expensive (by
+        total time) first."""
+        phases = sorted(
+            self.histograms.items(), key=lambda item: item[1].total, reverse=True
+        )
+        return {
+            phase: {
+                "count": h.count,
+                "mean": h.mean / 1e6,
+                "p50": h.quantile(0.5) / 1e6,
+                "p90": h.quantile(0.9) / 1e6,
+                "p99": h.quantile(0.99) / 1e6,
+                "max": h.max / 1e6,
+            }
+            for phase, h in phases
+        }
+
+    def report(self) -> str:
+        """Return the summary as a table, for printing."""
+        lines = [
+            f"{self.ticks} ticks, {self.over_budget} over the "
+            f"{self.budget_ms:.2f}ms budget",
+            f"{'phase':<32} {'count':>7} {'mean':>7} {'p50':>7} {'p90':>7} "
+            f"{'p99':>7} {'max':>7}",
+        ]
+        for phase, s in self.summary().items():
+            lines.append(
+                f"{phase:<32} {s['count']:7} {s['mean']:7.3f} {s['p50']:7.3f} "
+                f"{s['p90']:7.3f} {s['p99']:7.3f} {s['max']:7.3f}"
+            )
+        return "\n".join(lines)
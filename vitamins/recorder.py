@@ -0,0 +1,342 @@
+"""The `vitamins.recorder` module saves the stream of game tick packets and ball
+predictions to a file, so a match can be replayed and examined afterward.
+
+To record, set `Match.recorder` before the first tick. Every `Match.update` then appends
+one record:
+
+.. sourcecode:: python
+
+    from vitamins.match.match import Match
+    from vitamins.recorder import Recorder
+
+    class MyAgent(TaskAgent):
+        def first_tick(self):
+            Match.recorder = Recorder("match.vrec", field_info=self.get_field_info())
+
+To play back, open the file as a `Recording`. It is memory-mapped, so opening even an
+hour-long recording is instant, and any tick can be read by index or by game time:
+
+.. sourcecode:: python
+
+    from vitamins.recorder import Recording
+
+    with Recording("match.vrec") as recording:
+        packet, prediction = recording.at_time(125.0)
+
+# File format
+
+The file starts with the magic bytes `VITREC01`, a little-endian uint32 giving the length
+of a JSON header, and the header itself. The header describes the record layout: which
+byte ranges ("sections") of the `GameTickPacket` and `BallPrediction` structs are saved,
+and where each one goes in a record. Only the cars, boost pads, and prediction slices
+that are actually in use are saved, so a 1v1 record is about 20 kB (almost all of it
+ball prediction), or 1 kB with `prediction_slices=0`. The `FieldInfoPacket`, if given,
+is stored once after the header. Then come the records, all the same size, each aligned
+to 8 bytes.
+"""
+from bisect import bisect_right
+import ctypes
+import json
+import mmap
+import struct
+import time
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+from rlbot.utils.structures.game_data_struct import (
+    FieldInfoPacket,
+    GameInfo,
+    GameTickPacket,
+    PlayerInfo,
+    BoostPadState,
+)
+from rlbot.utils.structures.ball_prediction_struct import BallPrediction, Slice
+
+MAGIC = b"VITREC01"
+VERSION = 1
+_ALIGN = 8
+_HEADER_LENGTH = struct.Struct("<I")
+_STRUCTS = {"GameTickPacket": GameTickPacket, "BallPrediction": BallPrediction}
+
+
+def _aligned(n: int, align: int = _ALIGN) -> int:
+    return (n + align - 1) // align * align
+
+
+def _sections(
+    num_cars: int, num_boosts: int, prediction_slices: int
+) -> List[Tuple[str, str, int, int]]:
+    """(name, struct, offset in struct, size) of every byte range that is saved."""
+    P = GameTickPacket
+    sections = [
+        (
+            "game_cars",
+            "GameTickPacket",
+            P.game_cars.offset,
+            num_cars * ctypes.sizeof(PlayerInfo),
+        ),
+        ("num_cars", "GameTickPacket", P.num_cars.offset, P.num_cars.size),
+        (
+            "game_boosts",
+            "GameTickPacket",
+            P.game_boosts.offset,
+            num_boosts * ctypes.sizeof(BoostPadState),
+        ),
+        # num_boost, game_ball, and game_info are contiguous:
+        (
+            "ball_and_info",
+            "GameTickPacket",
+            P.num_boost.offset,
+            P.dropshot_tiles.offset - P.num_boost.offset,
+        ),
+        (
+            "teams",
+            "GameTickPacket",
+            P.teams.offset,
+            P.num_teams.offset + P.num_teams.size - P.teams.offset,
+        ),
+    ]
+    if prediction_slices:
+        B = BallPrediction
+        sections += [
+            (
+                "slices",
+                "BallPrediction",
+                B.slices.offset,
+                prediction_slices * ctypes.sizeof(Slice),
+            ),
+            ("num_slices", "BallPrediction", B.num_slices.offset, B.num_slices.size),
+        ]
+    return sections
+
+
+class Recorder:
+    """Appends one fixed-size record per tick to a file.
+
+    The layout is worked out on the first call to `record`, from the number of cars and
+    boost pads in the packet. After that, writing a record just hands prepared views
+    of the packet and prediction memory to the file, with no per-tick allocation.
+    Packets and predictions are normally the same objects every tick; if they change,
+    the views are prepared again.
+
+    :param path: File to write. An existing file is overwritten.
+    :param field_info: Stored once in the file, if given.
+    :param prediction_slices: How many ball prediction slices to save per tick. Zero
+        leaves out the prediction entirely.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        field_info: Optional[FieldInfoPacket] = None,
+        prediction_slices: int = 360,
+    ):
+        self.path = path
+        self.field_info = field_info
+        self.prediction_slices = prediction_slices
+        self.records = 0
+        self.file: Optional[BinaryIO] = None
+        self.record_size = 0
+        self._sections: List[Tuple[str, str, int, int]] = []
+        self._views: List = []
+        self._packet = None
+        self._prediction = None
+
+    def _start(self, packet: GameTickPacket):
+        """Work out the record layout and write the header."""
+        self._sections = _sections(
+            packet.num_cars, packet.num_boost, self.prediction_slices
+        )
+        layout, position = [], 0
+        for name, struct_name, offset, size in self._sections:
+            layout.append(
+                {
+                    "name": name,
+                    "struct": struct_name,
+                    "offset": offset,
+                    "size": size,
+                    "record_offset": position,
+                }
+            )
+            position = _aligned(position + size, 4)
+        self.record_size = _aligned(position)
+        info_offset = GameTickPacket.game_info.offset + GameInfo.seconds_elapsed.offset
+        time_offset = next(
+            s["record_offset"] + info_offset - s["offset"]
+            for s in layout
+            if s["name"] == "ball_and_info"
+        )
+        header = {
+            "version": VERSION,
+            "created": time.time(),
+            "record_size": self.record_size,
+            "num_cars": packet.num_cars,
+            "num_boosts": packet.num_boost,
+            "prediction_slices": self.prediction_slices,
+            "time_offset": time_offset,
+            "struct_sizes": {
+                name: ctypes.sizeof(cls) for name, cls in _STRUCTS.items()
+            },
+            "field_info_size": (
+                ctypes.sizeof(FieldInfoPacket) if self.field_info is not None else 0
+            ),
+            "sections": layout,
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        self.file = open(self.path, "wb")
+        self.file.write(MAGIC)
+        self.file.write(_HEADER_LENGTH.pack(len(header_bytes)))
+        self.file.write(header_bytes)
+        self._pad()
+        if self.field_info is not None:
+            self.file.write(memoryview(self.field_info).cast("B"))
+            self._pad()
+
+    def _pad(self):
+        position = self.file.tell()
+        self.file.write(bytes(_aligned(position) - position))
+
+    def _prepare(self, packet: GameTickPacket, prediction: BallPrediction):
+        """Build the list of memory views (and padding) that make up a record."""
+        objects = {"GameTickPacket": packet, "BallPrediction": prediction}
+        self._views, position = [], 0
+        for name, struct_name, offset, size in self._sections:
+            memory = memoryview(objects[struct_name]).cast("B")
+            self._views.append(memory[offset : offset + size])
+            end = _aligned(position + size, 4)
+            if end > position + size:
+                self._views.append(bytes(end - position - size))
+            position = end
+        if self.record_size > position:
+            self._views.append(bytes(self.record_size - position))
+        self._packet = packet
+        self._prediction = prediction
+
+    def record(self, packet: GameTickPacket, prediction: BallPrediction = None):
+        """Append the current tick."""
+        if self.file is None:
+            self._start(packet)
+        if prediction is None:
+            prediction = self._prediction
+            if prediction is None:
+                prediction = BallPrediction()
+        if packet is not self._packet or prediction is not self._prediction:
+            self._prepare(packet, prediction)
+        write = self.file.write
+        for view in self._views:
+            write(view)
+        self.records += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self._views = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """A memory-mapped recording made by `Recorder`.
+
+    `read` and `at_time` copy the saved sections of a record into a `GameTickPacket`
+    and a `BallPrediction` that belong to the recording and are reused, so each read
+    overwrites the previous one. Copy them (e.g. `GameTickPacket.from_buffer_copy`) if
+    you need to keep them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._copies = []
+        self._base = None
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a vitamins recording")
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        (length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        self.header = json.loads(self._mmap[start : start + length].decode("utf-8"))
+        for name, size in self.header["struct_sizes"].items():
+            if ctypes.sizeof(_STRUCTS[name]) != size:
+                self.close()
+                raise ValueError(f"{name} layout differs from the recording's")
+        position = _aligned(start + length)
+        self.field_info: Optional[FieldInfoPacket] = None
+        if self.header["field_info_size"]:
+            self.field_info = FieldInfoPacket.from_buffer_copy(self._mmap, position)
+            position = _aligned(position + self.header["field_info_size"])
+        self.data_offset = position
+        self.record_size = self.header["record_size"]
+        self.num_records = (len(self._mmap) - position) // self.record_size
+        self.packet = GameTickPacket()
+        self.prediction = BallPrediction()
+        objects = {"GameTickPacket": self.packet, "BallPrediction": self.prediction}
+        self._base = ctypes.c_char.from_buffer(self._mmap)
+        base = ctypes.addressof(self._base) + self.data_offset
+        self._copies = [
+            (
+                ctypes.addressof(objects[s["struct"]]) + s["offset"],
+                base + s["record_offset"],
+                s["size"],
+            )
+            for s in self.header["sections"]
+        ]
+        # Time index: the game time of every record, as a strided view of the mapping.
+        # Nothing is read until it's used, and a lookup only touches the few records
+        # its binary search lands on.
+        self.times = np.ndarray(
+            shape=(self.num_records,),
+            dtype=np.float32,
+            buffer=self._mmap,
+            offset=position + self.header["time_offset"],
+            strides=(self.record_size,),
+        )
+
+    def __len__(self) -> int:
+        return self.num_records
+
+    def read(self, index: int) -> Tuple[GameTickPacket, BallPrediction]:
+        """Return the packet and prediction of record number `index`."""
+        if index < 0:
+            index += self.num_records
+        if not 0 <= index < self.num_records:
+            raise IndexError(f"Record {index} out of range")
+        offset = index * self.record_size
+        for destination, source, size in self._copies:
+            ctypes.memmove(destination, source + offset, size)
+        return self.packet, self.prediction
+
+    def index_at(self, game_time: float) -> int:
+        """Index of the last record at or before `game_time` (or the first record)."""
+        # Not np.searchsorted, which would copy the whole (non-contiguous) view first:
+        index = bisect_right(self.times, game_time) - 1
+        return min(max(index, 0), self.num_records - 1)
+
+    def at_time(self, game_time: float) -> Tuple[GameTickPacket, BallPrediction]:
+        """Return the packet and prediction of the last record at or before
+        `game_time`."""
+        return self.read(self.index_at(game_time))
+
+    def __iter__(self) -> Iterator[Tuple[GameTickPacket, BallPrediction]]:
+        for index in range(self.num_records):
+            yield self.read(index)
+
+    def close(self):
+        self._copies = []
+        self._base = None
+        self.times = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,217 @@
+"""The `vitamins.shmring` module streams messages to other processes on the same machine
+through shared memory, with none of the encoding and system calls of a socket.
+
+The bot writes with a `RingWriter`, and any number of other processes read with a
+`RingReader`. The `put` and `get` methods, and the `Message`s they deal in, are the
+same as those of the `vitamins.comms` queues:
+
+.. sourcecode:: python
+
+    # In the bot:
+    from vitamins.shmring import RingWriter
+
+    ring = RingWriter("maruchamp-telemetry")
+    ring.put("ball", tuple(Match.ball.position))
+
+    # In another process:
+    from vitamins.shmring import RingReader
+
+    reader = RingReader("maruchamp-telemetry")
+    while True:
+        message = reader.get()
+
+The shared memory holds a ring of fixed-size slots, and each message is written into
+the next slot as a `vitamins.comms` frame. By default only the `struct`-based codecs
+are allowed, so the bot never pickles anything. The writer never waits for readers:
+once the ring is full, it overwrites the oldest slot. A reader that falls that far
+behind skips ahead to the oldest message still there, and counts the ones it lost in
+`missed`. Each slot has a sequence number that the writer makes odd while it's writing
+the slot, and sets to twice the message number plus two when it's done ("seqlock"), so
+readers can tell both a half-written slot and one that was overwritten while they
+were reading it.
+
+Needs Python 3.8 or later, for `multiprocessing.shared_memory`.
+"""
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, List, Optional
+
+from vitamins.comms import HEADER, Codec, Message, SAFE_CODECS, encode_frame
+
+MAGIC = b"VITRING1"
+_RING_HEADER = struct.Struct("<8sIIQ")  # magic, slot size, number of slots, head
+_HEAD_OFFSET = 16
+_SLOTS_OFFSET = 64
+_SEQ = struct.Struct("<Q")
+_SLOT_HEADER = struct.Struct("<QI")  # sequence number, frame length
+_SLOT_HEADER_SIZE = 16
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # Before Python 3.13, attaching also registers the memory to be deleted when this
+    # process exits, which would pull it out from under the writer:
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class RingWriter:
+    """Creates the shared memory ring, and writes messages into it.
+
+    :param name: Name that readers attach by. If None, one is made up (see `name`).
+    :param slots: Number of messages the ring holds.
+    :param slot_size: Bytes per slot; a message must fit in one slot, less 16 bytes.
+    :param codecs: Codecs for encoding, as in `vitamins.comms`.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        slots: int = 1024,
+        slot_size: int = 4096,
+        codecs: List[Codec] = SAFE_CODECS,
+    ):
+        if slot_size % 8 or slot_size <= _SLOT_HEADER_SIZE:
+            raise ValueError("slot_size must be a multiple of 8, more than 16")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_frame_bytes = slot_size - _SLOT_HEADER_SIZE  # largest message, encoded
+        self.codecs = codecs
+        self.memory = shared_memory.SharedMemory(
+            name, create=True, size=_SLOTS_OFFSET + slots * slot_size
+        )
+        self.buffer = self.memory.buf
+        _RING_HEADER.pack_into(self.buffer, 0, MAGIC, slot_size, slots, 0)
+        self.count = 0  # messages written so far
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def put(self, tag: str, data: Any = None) -> int:
+        """Write (tag, data) into the next slot. Return the message id, which is the
+        number of messages written before it."""
+        msg_id = self.count
+        frame = encode_frame(msg_id, tag, data, self.codecs)
+        if len(frame) > self.max_frame_bytes:
+            raise ValueError(
+                f"{len(frame)}-byte message doesn't fit in a {self.slot_size}-byte slot"
+            )
+        slot = _SLOTS_OFFSET + (msg_id % self.slots) * self.slot_size
+        start = slot + _SLOT_HEADER_SIZE
+        buffer = self.buffer
+        _SEQ.pack_into(buffer, slot, 2 * msg_id + 1)  # odd: being written
+        buffer[start : start + len(frame)] = frame
+        _SLOT_HEADER.pack_into(buffer, slot, 2 * msg_id + 2, len(frame))
+        self.count = msg_id + 1
+        _SEQ.pack_into(buffer, _HEAD_OFFSET, self.count)
+        return msg_id
+
+    # Like a `vitamins.comms` queue, but the ring never waits for anyone, so there's
+    # never anything left to send:
+    connected = True
+
+    def flush(self):
+        pass
+
+    def pending(self) -> int:
+        return 0
+
+    def close(self, unlink: bool = True):
+        """Detach from the ring and, if `unlink` is True, delete it. Readers that are
+        still attached keep their view of it until they close."""
+        if self.memory is None:
+            return
+        self.buffer.release()
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RingReader:
+    """Attaches to a ring made by a `RingWriter`, and reads messages from it.
+
+    :param name: The writer's `name`.
+    :param from_start: If True, start with the oldest message still in the ring.
+        Otherwise, start with the next message written.
+    :param codecs: Codecs for decoding. Messages with any other codec are skipped.
+    """
+
+    def __init__(
+        self, name: str, from_start: bool = False, codecs: List[Codec] = SAFE_CODECS
+    ):
+        self.memory = _attach(name)
+        self.buffer = self.memory.buf
+        magic, self.slot_size, self.slots, head = _RING_HEADER.unpack_from(
+            self.buffer, 0
+        )
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{name} is not a vitamins ring")
+        self.decoders = {codec.id: codec.decode for codec in codecs}
+        self.next = max(head - self.slots, 0) if from_start else head
+        self.missed = 0  # messages overwritten before they could be read
+        self.undecodable = 0
+
+    def _head(self) -> int:
+        return _SEQ.unpack_from(self.buffer, _HEAD_OFFSET)[0]
+
+    def get(self) -> Optional[Message]:
+        """Return the next message, or None if there isn't one yet."""
+        while True:
+            msg_id = self.next
+            slot = _SLOTS_OFFSET + (msg_id % self.slots) * self.slot_size
+            done = 2 * msg_id + 2
+            seq, length = _SLOT_HEADER.unpack_from(self.buffer, slot)
+            if seq < done:
+                return None  # not written yet, or being written now
+            if seq == done:
+                start = slot + _SLOT_HEADER_SIZE
+                frame = bytes(self.buffer[start : start + length])
+                if _SEQ.unpack_from(self.buffer, slot)[0] == done:
+                    self.next = msg_id + 1
+                    message = self._decode(frame)
+                    if message is not None:
+                        return message
+                    continue
+            # Overwritten: skip to the oldest message that's still in the ring.
+            oldest = max(self._head() - self.slots + 1, msg_id + 1)
+            self.missed += oldest - msg_id
+            self.next = oldest
+
+    def _decode(self, frame: bytes) -> Optional[Message]:
+        payload_length, msg_id, tag_length, codec_id = HEADER.unpack_from(frame)
+        decode = self.decoders.get(codec_id)
+        if decode is None:
+            self.undecodable += 1
+            return None
+        start = HEADER.size + tag_length
+        tag = frame[HEADER.size : start].decode()
+        return Message(msg_id, tag, decode(memoryview(frame)[start:]))
+
+    def close(self):
+        if self.memory is None:
+            return
+        self.buffer.release()
+        self.memory.close()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
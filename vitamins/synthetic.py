@@ -0,0 +1,521 @@
+"""The `vitamins.synthetic` module makes up game tick packets, so that `Match`, the
+agents, and the task scheduler can be run and stress-tested without the game.
+
+`SyntheticMatch` plays a rough imitation of a soccar match: cars drive around the
+ground chasing the ball, pick up boost, and hit it; the ball flies, bounces off the
+walls, and goes in the goals; and every goal is followed by a kickoff. It fills in a
+`GameTickPacket` and a `BallPrediction` (the ball's actual future path), and
+`field_info()` gives the matching `FieldInfoPacket`. Everything is generated from a
+seed, so the same seed always gives the same match.
+
+.. sourcecode:: python
+
+    from vitamins.synthetic import SyntheticMatch
+
+    match = SyntheticMatch(num_cars=8, seed=1)
+    for packet, prediction in match.run(120 * 60):
+        ...
+
+The packet and prediction are updated in place every tick, and the cars and boost pads
+are moved in bulk through numpy views of the packet, so a tick is cheap even with
+the full 64 cars the packet has room for. Use `snapshots` to keep copies.
+"""
+import ctypes
+import math
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from rlbot.utils.structures.ball_prediction_struct import (
+    BallPrediction,
+    MAX_SLICES,
+    Slice,
+)
+from rlbot.utils.structures.game_data_struct import (
+    BoostPadState,
+    FieldInfoPacket,
+    GameTickPacket,
+    MAX_PLAYERS,
+    Physics,
+    PlayerInfo,
+)
+
+# Standard soccar boost pads. The big ones are at z = 73:
+BOOST_PADS = [
+    (0, -4240, 70),
+    (-1792, -4184, 70),
+    (1792, -4184, 70),
+    (-3072, -4096, 73),
+    (3072, -4096, 73),
+    (-940, -3308, 70),
+    (940, -3308, 70),
+    (0, -2816, 70),
+    (-3584, -2484, 70),
+    (3584, -2484, 70),
+    (-1788, -2300, 70),
+    (1788, -2300, 70),
+    (-2048, -1036, 70),
+    (0, -1024, 70),
+    (2048, -1036, 70),
+    (-3584, 0, 73),
+    (-1024, 0, 70),
+    (1024, 0, 70),
+    (3584, 0, 73),
+    (-2048, 1036, 70),
+    (0, 1024, 70),
+    (2048, 1036, 70),
+    (-1788, 2300, 70),
+    (1788, 2300, 70),
+    (-3584, 2484, 70),
+    (3584, 2484, 70),
+    (0, 2816, 70),
+    (-940, 3310, 70),
+    (940, 3308, 70),
+    (-3072, 4096, 73),
+    (3072, 4096, 73),
+    (-1792, 4184, 70),
+    (1792, 4184, 70),
+    (0, 4240, 70),
+]
+
+# Blue kickoff spots (x, y, yaw); orange's are the same rotated half a turn:
+KICKOFF_SPOTS = [
+    (-2048, -2560, math.pi / 4),
+    (2048, -2560, 3 * math.pi / 4),
+    (-256, -3840, math.pi / 2),
+    (256, -3840, math.pi / 2),
+    (0, -4608, math.pi / 2),
+]
+
+TICK_RATE = 120
+GRAVITY = -650
+BALL_RADIUS = 92.75
+BALL_MAX_SPEED = 6000
+CAR_MAX_SPEED = 2300
+CAR_THROTTLE_SPEED = 1410
+CAR_Z = 17.01
+SIDE_WALL = 4096
+BACK_WALL = 5120
+CEILING = 2044
+GOAL_WIDTH = 2 * 892.755
+GOAL_HEIGHT = 642.775
+GOAL_DEPTH = 880
+KICKOFF_COUNTDOWN = 3.0  # seconds the cars are frozen before a kickoff
+
+_RESTITUTION = 0.6
+_DRAG = 0.0305  # fraction of the ball's velocity lost per second
+_BIG_PAD_RADIUS = 208
+_SMALL_PAD_RADIUS = 144
+_BIG_PAD_RESPAWN = 10
+_SMALL_PAD_RESPAWN = 4
+
+# Column layouts of the structs viewed as rows of 4-byte values:
+_SLICE_FLOATS = ctypes.sizeof(Slice) // 4
+_SLICE_LOCATION = (Slice.physics.offset + Physics.location.offset) // 4
+_SLICE_VELOCITY = (Slice.physics.offset + Physics.velocity.offset) // 4
+_SLICE_TIME = Slice.game_seconds.offset // 4
+_CAR_WORDS = ctypes.sizeof(PlayerInfo) // 4
+_CAR_LOCATION = (PlayerInfo.physics.offset + Physics.location.offset) // 4
+_CAR_YAW = (PlayerInfo.physics.offset + Physics.rotation.offset) // 4 + 1
+_CAR_VELOCITY = (PlayerInfo.physics.offset + Physics.velocity.offset) // 4
+_CAR_ANGULAR_VELOCITY = (
+    PlayerInfo.physics.offset + Physics.angular_velocity.offset
+) // 4
+_CAR_BOOST = PlayerInfo.boost.offset // 4
+_PAD_BYTES = ctypes.sizeof(BoostPadState)
+
+
+def field_info() -> FieldInfoPacket:
+    """Return a `FieldInfoPacket` for the standard soccar field."""
+    info = FieldInfoPacket()
+    info.num_boosts = len(BOOST_PADS)
+    for pad, (x, y, z) in zip(info.boost_pads, BOOST_PADS):
+        pad.location.x, pad.location.y, pad.location.z = x, y, z
+        pad.is_full_boost = z == 73
+    info.num_goals = 2
+    for team, goal in enumerate(info.goals[:2]):
+        side = 1 if team else -1
+        goal.team_num = team
+        goal.location.y, goal.location.z = side * BACK_WALL, GOAL_HEIGHT / 2
+        goal.direction.y = -side
+        goal.width, goal.height = GOAL_WIDTH, GOAL_HEIGHT
+    return info
+
+
+def _in_goal_mouth(x: float, z: float) -> bool:
+    return abs(x) < GOAL_WIDTH / 2 - BALL_RADIUS and z < GOAL_HEIGHT - BALL_RADIUS
+
+
+def simulate_ball(
+    state: Tuple[float, ...], start_time: float, steps: int, dt: float = 1 / TICK_RATE
+) -> np.ndarray:
+    """Simulate the ball's flight from `state` (x, y, z, vx, vy, vz) at `start_time`.
+    Returns `steps` rows in the layout of a `Slice` (as float32 values), the first one
+    being `state` itself.
+
+    The model is simple: gravity, air drag, and bounces off the floor, ceiling and
+    walls that lose some speed. A ball that gets into a goal stops at the back.
+    """
+    rows = np.zeros((steps, _SLICE_FLOATS), dtype=np.float32)
+    x, y, z, vx, vy, vz = state
+    drag = 1 - _DRAG * dt
+    floor, ceiling = BALL_RADIUS, CEILING - BALL_RADIUS
+    side, back = SIDE_WALL - BALL_RADIUS, BACK_WALL - BALL_RADIUS
+    for i in range(steps):
+        rows[i, _SLICE_LOCATION : _SLICE_LOCATION + 3] = x, y, z
+        rows[i, _SLICE_VELOCITY : _SLICE_VELOCITY + 3] = vx, vy, vz
+        rows[i, _SLICE_TIME] = start_time + i * dt
+        if abs(y) > BACK_WALL + GOAL_DEPTH - BALL_RADIUS:
+            vx = vy = vz = 0.0  # in the back of the net
+            continue
+        vz += GRAVITY * dt
+        vx, vy, vz = vx * drag, vy * drag, vz * drag
+        x, y, z = x + vx * dt, y + vy * dt, z + vz * dt
+        if z < floor:
+            z, vz = floor, -_RESTITUTION * vz
+            vx, vy = 0.9 * vx, 0.9 * vy
+        elif z > ceiling:
+            z, vz = ceiling, -_RESTITUTION * vz
+        if abs(x) > side:
+            x, vx = math.copysign(side, x), -_RESTITUTION * vx
+        if abs(y) > back and abs(y) - vy * dt * math.copysign(1, y) <= back:
+            if not _in_goal_mouth(x, z):
+                y, vy = math.copysign(back, y), -_RESTITUTION * vy
+    return rows
+
+
+class SyntheticMatch:
+    """Generates a deterministic stream of packets and ball predictions.
+
+    :param num_cars: Number of cars, up to 64. Even-numbered cars are blue, odd ones
+        orange.
+    :param seed: Seed for everything random.
+    :param kickoff: If True, start with a kickoff, else with the ball in the air.
+    :param kickoff_every: If given, start a new kickoff this many seconds after each
+        kickoff, even if nobody scored.
+    :param slice_dt: Time between ball prediction slices. Must be a whole number of
+        ticks.
+    :param prediction_slices: Number of ball prediction slices.
+    :param start_time: Game time of the first tick.
+    """
+
+    def __init__(
+        self,
+        num_cars: int = 2,
+        seed: int = 0,
+        kickoff: bool = True,
+        kickoff_every: Optional[float] = None,
+        slice_dt: float = 1 / 60,
+        prediction_slices: int = MAX_SLICES,
+        start_time: float = 10.0,
+    ):
+        if not 1 <= num_cars <= MAX_PLAYERS:
+            raise ValueError(f"num_cars must be from 1 to {MAX_PLAYERS}")
+        self.slice_step = round(slice_dt * TICK_RATE)
+        if self.slice_step < 1 or abs(self.slice_step - slice_dt * TICK_RATE) > 1e-6:
+            raise ValueError("slice_dt must be a whole number of ticks")
+        if not 0 < prediction_slices <= MAX_SLICES:
+            raise ValueError(f"prediction_slices must be from 1 to {MAX_SLICES}")
+        self.num_cars = num_cars
+        self.kickoff_every = kickoff_every
+        self.prediction_slices = prediction_slices
+        self.random = np.random.RandomState(seed)
+        self.field_info = field_info()
+        self.packet = GameTickPacket()
+        self.prediction = BallPrediction()
+        self.prediction.num_slices = prediction_slices
+        self.tick = 0
+        self.time = self.start_time = start_time
+        self.goals = 0
+        self.touches = 0
+
+        # Views of the packet and prediction memory, for bulk updates:
+        words = (MAX_PLAYERS, _CAR_WORDS)
+        cars = self.packet.game_cars
+        self._car_floats = np.frombuffer(cars, dtype=np.float32).reshape(words)
+        self._car_ints = np.frombuffer(cars, dtype=np.int32).reshape(words)
+        pads = np.frombuffer(self.packet.game_boosts, dtype=np.uint8)
+        self._pad_active = pads.reshape(-1, _PAD_BYTES)[
+            :, BoostPadState.is_active.offset
+        ]
+        pads = np.frombuffer(self.packet.game_boosts, dtype=np.float32)
+        self._pad_timer = pads.reshape(-1, _PAD_BYTES // 4)[
+            :, BoostPadState.timer.offset // 4
+        ]
+        slices = np.frombuffer(self.prediction.slices, dtype=np.float32)
+        self._slices = slices.reshape(MAX_SLICES, _SLICE_FLOATS)
+
+        # Car state:
+        self.teams = np.arange(num_cars) % 2
+        self.positions = np.zeros((num_cars, 2))
+        self.yaws = np.zeros(num_cars)
+        self.speeds = np.zeros(num_cars)
+        self.boosts = np.full(num_cars, 33.0)
+        self._offsets = np.zeros((num_cars, 2))  # where each car heads, from the ball
+        self._yaw_rates = np.zeros(num_cars)
+        self._velocities = np.zeros((num_cars, 2))
+        # Boost pad state:
+        self.pad_locations = np.array(BOOST_PADS, dtype=float)[:, :2]
+        self.pad_big = np.array([z == 73 for _, _, z in BOOST_PADS])
+        self.pad_active = np.ones(len(BOOST_PADS), dtype=bool)
+        self.pad_timers = np.zeros(len(BOOST_PADS))
+        # Ball path, one row per tick from tick `_path_start` on:
+        self._path = np.zeros((0, _SLICE_FLOATS), dtype=np.float32)
+        self._path_start = 0
+        self._countdown = 0  # ticks until a kickoff starts
+        self._round_start = start_time
+        self._kickoff_time = -math.inf
+        self._last_touch_time = -math.inf
+
+        self._init_packet()
+        if kickoff:
+            self.start_kickoff()
+        else:
+            self._spread_cars()
+            state = (0.0, 0.0, 800.0, *(self.random.uniform(-1200, 1200, 2)), 400.0)
+            self._new_path(state)
+        self._write()
+
+    def _init_packet(self):
+        packet = self.packet
+        packet.num_cars = self.num_cars
+        packet.num_boost = len(BOOST_PADS)
+        packet.num_teams = 2
+        for team in (0, 1):
+            packet.teams[team].team_index = team
+        packet.game_info.world_gravity_z = GRAVITY
+        packet.game_info.game_speed = 1
+        packet.game_ball.collision_shape.type = 1  # sphere
+        packet.game_ball.collision_shape.sphere.diameter = 2 * BALL_RADIUS
+        for i in range(self.num_cars):
+            car = packet.game_cars[i]
+            car.name = f"Synthetic {i}"
+            car.is_bot = True
+            car.team = int(self.teams[i])
+            car.spawn_id = i + 1
+            car.has_wheel_contact = True
+            car.hitbox.length, car.hitbox.width, car.hitbox.height = 118.01, 84.2, 36.16
+            car.hitbox_offset.x, car.hitbox_offset.z = 13.88, 20.75
+        self._car_floats[: self.num_cars, _CAR_LOCATION + 2] = CAR_Z
+
+    def _spread_cars(self):
+        """Put the cars at random spots on the field, facing random ways."""
+        n = self.num_cars
+        self.positions[:] = self.random.uniform(-1, 1, (n, 2)) * (3500, 4500)
+        self.yaws[:] = self.random.uniform(-math.pi, math.pi, n)
+        self.speeds[:] = self.random.uniform(0, CAR_THROTTLE_SPEED, n)
+        self._offsets[:] = self.random.normal(0, 800, (n, 2))
+
+    def start_kickoff(self):
+        """Put the ball at center and the cars on their kickoff spots, and start the
+        countdown."""
+        self._countdown = round(KICKOFF_COUNTDOWN * TICK_RATE)
+        self._round_start = self._kickoff_time = self.time
+        for team in (0, 1):
+            cars = np.flatnonzero(self.teams == team)
+            spots = self.random.permutation(len(KICKOFF_SPOTS))
+            for rank, i in enumerate(cars):
+                x, y, yaw = KICKOFF_SPOTS[spots[rank % len(KICKOFF_SPOTS)]]
+                # Past the fifth car, the spots are reused, each time further back:
+                y -= 200 * (rank // len(KICKOFF_SPOTS))
+                if team:
+                    x, y, yaw = -x, -y, yaw - math.pi
+                self.positions[i] = x, y
+                self.yaws[i] = yaw
+        self.speeds[:] = 0
+        self._yaw_rates[:] = 0
+        self._velocities[:] = 0
+        self.boosts[:] = 33
+        self._offsets[:] = 0
+        self.pad_active[:] = True
+        self.pad_timers[:] = 0
+        self._new_path((0.0, 0.0, BALL_RADIUS, 0.0, 0.0, 0.0))
+
+    def _new_path(self, state: Tuple[float, ...]):
+        """Start a new ball path from the current tick."""
+        steps = self.slice_step * (self.prediction_slices + 1) + 2 * TICK_RATE
+        self._path = simulate_ball(state, self.time, steps)
+        self._path_start = self.tick
+
+    def _ball_row(self, ticks_ahead: int = 0) -> np.ndarray:
+        """The ball path row for `ticks_ahead` ticks from now, simulating further
+        ahead as needed."""
+        needed = self.tick - self._path_start + ticks_ahead + 1
+        if needed > len(self._path):
+            # Drop the rows already played, and extend by a couple of seconds:
+            played = self.tick - self._path_start
+            last = self._path[-1]
+            state = (
+                *last[_SLICE_LOCATION : _SLICE_LOCATION + 3],
+                *last[_SLICE_VELOCITY : _SLICE_VELOCITY + 3],
+            )
+            more = simulate_ball(
+                tuple(float(v) for v in state),
+                float(last[_SLICE_TIME]),
+                needed - len(self._path) + 2 * TICK_RATE + 1,
+            )
+            self._path = np.concatenate((self._path[played:], more[1:]))
+            self._path_start = self.tick
+        return self._path[self.tick - self._path_start + ticks_ahead]
+
+    def step(self) -> GameTickPacket:
+        """Advance one tick, and return the updated packet."""
+        dt = 1 / TICK_RATE
+        self.tick += 1
+        self.time += dt
+        if self._countdown:
+            self._countdown -= 1
+        else:
+            self._move_cars(dt)
+            self._update_pads(dt)
+            self._check_touch()
+        ball = self._ball_row()
+        if abs(ball[_SLICE_LOCATION + 1]) > BACK_WALL + BALL_RADIUS:
+            # Goal! A ball in the orange (positive y) goal is a point for blue:
+            scorer = 0 if ball[_SLICE_LOCATION + 1] > 0 else 1
+            self.packet.teams[scorer].score += 1
+            self.goals += 1
+            touch = self.packet.game_ball.latest_touch
+            if self.touches and touch.team == scorer:
+                self.packet.game_cars[touch.player_index].score_info.goals += 1
+            self.start_kickoff()
+        elif (
+            self.kickoff_every is not None
+            and self.time - self._round_start >= self.kickoff_every
+        ):
+            self.start_kickoff()
+        self._write()
+        return self.packet
+
+    def _move_cars(self, dt: float):
+        """Drive every car toward its spot near the ball."""
+        n = self.num_cars
+        ball = self._ball_row()
+        ball_xy = ball[_SLICE_LOCATION : _SLICE_LOCATION + 2].astype(float)
+        # Now and then (about every two seconds), each car picks a new spot:
+        renew = self.random.random_sample(n) < dt / 2
+        if renew.any() and not self.is_kickoff:
+            self._offsets[renew] = self.random.normal(0, 800, (renew.sum(), 2))
+        to_target = ball_xy + self._offsets - self.positions
+        desired = np.arctan2(to_target[:, 1], to_target[:, 0])
+        error = (desired - self.yaws + math.pi) % (2 * math.pi) - math.pi
+        yaw_rates = np.clip(4 * error, -2.5, 2.5)
+        boosting = (self.boosts > 0) & (np.abs(error) < 0.3)
+        top = np.where(boosting, CAR_MAX_SPEED, CAR_THROTTLE_SPEED)
+        self.speeds += np.clip(top - self.speeds, -3500 * dt, 1000 * dt)
+        self.boosts = np.maximum(self.boosts - boosting * (100 / 3 * dt), 0)
+        self.yaws = (self.yaws + yaw_rates * dt + math.pi) % (2 * math.pi) - math.pi
+        velocities = self.speeds[:, None] * np.stack(
+            (np.cos(self.yaws), np.sin(self.yaws)), axis=1
+        )
+        self.positions += velocities * dt
+        np.clip(
+            self.positions, (-SIDE_WALL + 60, -BACK_WALL + 60), None, self.positions
+        )
+        np.clip(self.positions, None, (SIDE_WALL - 60, BACK_WALL - 60), self.positions)
+        self._yaw_rates = yaw_rates
+        self._velocities = velocities
+
+    def _update_pads(self, dt: float):
+        """Respawn pads whose time is up, and let cars pick up the active ones."""
+        self.pad_timers[~self.pad_active] += dt
+        respawn = np.where(self.pad_big, _BIG_PAD_RESPAWN, _SMALL_PAD_RESPAWN)
+        respawned = ~self.pad_active & (self.pad_timers >= respawn)
+        self.pad_active[respawned] = True
+        self.pad_timers[respawned] = 0
+        offsets = self.positions[:, None, :] - self.pad_locations[None, :, :]
+        distances = np.hypot(offsets[..., 0], offsets[..., 1])
+        radius = np.where(self.pad_big, _BIG_PAD_RADIUS, _SMALL_PAD_RADIUS)
+        reach = (distances < radius) & self.pad_active & (self.boosts < 100)[:, None]
+        for car, pad in zip(*np.nonzero(reach)):
+            if self.pad_active[pad]:
+                self.pad_active[pad] = False
+                amount = 100 if self.pad_big[pad] else 12
+                self.boosts[car] = min(self.boosts[car] + amount, 100)
+
+    def _check_touch(self):
+        """If a car has reached the ball, it hits it."""
+        if self.time - self._last_touch_time < 0.25:
+            return
+        ball = self._ball_row()
+        location = ball[_SLICE_LOCATION : _SLICE_LOCATION + 3].astype(float)
+        if location[2] > 300:
+            return
+        distances = np.hypot(*(self.positions - location[:2]).T)
+        car = int(np.argmin(distances))
+        if distances[car] > BALL_RADIUS + 70:
+            return
+        # Off it goes, mostly the way the car was heading, a bit away from it, and up:
+        away = location[:2] - self.positions[car]
+        away /= max(np.hypot(*away), 1)
+        velocity = np.empty(3)
+        velocity[:2] = 1.4 * self._velocities[car] + 500 * away
+        velocity[2] = self.random.uniform(0, 800)
+        speed = np.linalg.norm(velocity)
+        if speed > BALL_MAX_SPEED:
+            velocity *= BALL_MAX_SPEED / speed
+        self._new_path((*location, *velocity))
+        self._last_touch_time = self.time
+        self.touches += 1
+        touch = self.packet.game_ball.latest_touch
+        touch.player_name = self.packet.game_cars[car].name
+        touch.time_seconds = self.time
+        touch.hit_location.x, touch.hit_location.y, touch.hit_location.z = location
+        touch.hit_normal.x, touch.hit_normal.y = -away
+        touch.team = int(self.teams[car])
+        touch.player_index = car
+
+    @property
+    def is_kickoff(self) -> bool:
+        """True from the start of a kickoff until someone touches the ball."""
+        return self._last_touch_time < self._kickoff_time
+
+    def _write(self):
+        """Copy the current state into the packet and the prediction."""
+        info = self.packet.game_info
+        info.seconds_elapsed = self.time
+        info.frame_num = self.tick
+        info.game_time_remaining = max(300 - (self.time - self.start_time), 0)
+        info.is_kickoff_pause = self.is_kickoff
+        info.is_round_active = self._countdown == 0
+
+        cars = self._car_floats[: self.num_cars]
+        cars[:, _CAR_LOCATION : _CAR_LOCATION + 2] = self.positions
+        cars[:, _CAR_YAW] = self.yaws
+        cars[:, _CAR_VELOCITY : _CAR_VELOCITY + 2] = self._velocities
+        cars[:, _CAR_ANGULAR_VELOCITY + 2] = self._yaw_rates
+        self._car_ints[: self.num_cars, _CAR_BOOST] = self.boosts
+        self._pad_active[: len(BOOST_PADS)] = self.pad_active
+        self._pad_timer[: len(BOOST_PADS)] = self.pad_timers
+
+        ball = self._ball_row()
+        physics = self.packet.game_ball.physics
+        location = ball[_SLICE_LOCATION : _SLICE_LOCATION + 3].tolist()
+        velocity = ball[_SLICE_VELOCITY : _SLICE_VELOCITY + 3].tolist()
+        physics.location.x, physics.location.y, physics.location.z = location
+        physics.velocity.x, physics.velocity.y, physics.velocity.z = velocity
+        step, n = self.slice_step, self.prediction_slices
+        self._ball_row(step * n)  # make sure the path reaches far enough
+        start = self.tick - self._path_start + step
+        self._slices[:n] = self._path[start : start + step * n : step]
+
+    def run(self, ticks: int) -> Iterator[Tuple[GameTickPacket, BallPrediction]]:
+        """Generate `ticks` ticks, yielding the packet and prediction (the same two
+        objects every time, updated in place). The first is the current tick."""
+        yield self.packet, self.prediction
+        for _ in range(ticks - 1):
+            self.step()
+            yield self.packet, self.prediction
+
+    def snapshots(self, ticks: int) -> List[Tuple[GameTickPacket, BallPrediction]]:
+        """Like `run`, but returns copies of the packets and predictions."""
+        return [
+            (
+                GameTickPacket.from_buffer_copy(packet),
+                BallPrediction.from_buffer_copy(prediction),
+            )
+            for packet, prediction in self.run(ticks)
+        ]
+
+    def get_ball_prediction(self) -> BallPrediction:
+        """For use as an agent's ball prediction function."""
+        return self.prediction
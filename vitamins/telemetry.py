@@ -0,0 +1,248 @@
+"""The `vitamins.telemetry` module sends a stream of many small messages (per-tick state,
+task scores, and so on) over a `vitamins.comms` queue, without letting it grow without
+bound when the other end is slow or gone.
+
+`Telemetry.put` only adds the message to a buffer of at most `max_items`. What happens
+when the buffer is full depends on the policy:
+
+* `DROP_OLDEST` discards the oldest message to make room.
+* `DROP_NEWEST` discards the new message.
+* `LATEST_PER_TAG` keeps only the latest message for each tag, so a new message
+  replaces any that's still waiting with the same tag. If the buffer is full of other
+  tags, the oldest is discarded.
+
+From time to time, everything in the buffer (up to `max_batch_bytes`) is sent as a
+single message, tagged `BATCH_TAG`, whose data is the messages' frames run together.
+Batches are also kept small enough for the queue to take: a `RingWriter`'s slot, or a
+`Host`'s per-client queue. A message too big to fit in a batch by itself, or that can't
+be encoded, is dropped. Nothing here raises on the bot's thread. On the other end,
+`unpack` turns a batch back into the messages:
+
+.. sourcecode:: python
+
+    # In the bot:
+    telemetry = Telemetry(Host(rate=120), policy=LATEST_PER_TAG)
+    telemetry.put("ball", tuple(Match.ball.position))
+
+    # In the other program:
+    for message in unpack(client.get()):
+        ...
+
+The flush rate adapts, between `min_rate` and `max_rate` times a second: it goes up
+while there's more in the buffer than one batch can take, and is halved while the queue
+underneath still hasn't sent the last batch, in which case nothing more is added to it.
+It also creeps back down when there's little to send. The underlying queue only sends as
+often as its own `rate`, so give it a rate at least as high as `max_rate`. A
+`vitamins.shmring.RingWriter` works as the queue too.
+
+`stats` returns the buffer depth, the numbers of messages dropped and sent, and the
+bytes sent per second, for the bot to display or log.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+from time import monotonic as now
+
+from vitamins.comms import HEADER, CODECS, Codec, Message, encode_frame
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+LATEST_PER_TAG = "latest-per-tag"
+POLICIES = (DROP_OLDEST, DROP_NEWEST, LATEST_PER_TAG)
+BATCH_TAG = "telemetry.batch"
+
+
+class TelemetryStats(NamedTuple):
+    queued: int  # messages waiting in the buffer
+    dropped: int  # messages discarded by the policy, in all
+    sent: int  # messages sent, in all
+    batches: int  # batches sent, in all
+    bytes_per_second: float  # batch bytes sent, over about the last second
+    rate: float  # current flush rate, per second
+
+
+class Telemetry:
+    """A bounded, batching buffer in front of a `vitamins.comms` queue.
+
+    :param queue: A `Host`, `Client` or `RingWriter`, or anything else with their
+        `put(tag, data)`, `flush()` and `pending()` methods and `connected` attribute.
+    :param policy: What to do when the buffer is full (see the module docs).
+    :param max_items: Most messages the buffer holds.
+    :param max_batch_bytes: Most bytes of messages in one batch.
+    :param min_rate: Lowest flush rate, per second.
+    :param max_rate: Highest flush rate, per second.
+    :param codecs: Codecs for the messages within batches, as in `vitamins.comms`.
+    """
+
+    def __init__(
+        self,
+        queue,
+        policy: str = DROP_OLDEST,
+        max_items: int = 1024,
+        max_batch_bytes: int = 1 << 16,
+        min_rate: float = 5,
+        max_rate: float = 120,
+        codecs: List[Codec] = CODECS,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+        self.queue = queue
+        self.policy = policy
+        self.max_items = max_items
+        self.max_batch_bytes = max_batch_bytes
+        # The batch goes out as one message, which the queue may limit in size:
+        for limit in (
+            getattr(queue, "max_frame_bytes", None),  # RingWriter
+            getattr(queue, "client_queue_bytes", None),  # Host
+        ):
+            if limit is not None:
+                overhead = HEADER.size + len(BATCH_TAG.encode())
+                self.max_batch_bytes = min(self.max_batch_bytes, limit - overhead)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.codecs = codecs
+        self.buffer: Deque[Tuple[int, str, Any]] = deque()
+        self.latest: Dict[str, Tuple[int, Any]] = {}  # for LATEST_PER_TAG
+        self.msg_index = 0
+        self.rate = float(min_rate)
+        self.next_flush = now()
+        self.dropped = 0
+        self.sent = 0
+        self.batches = 0
+        self.bytes_per_second = 0.0
+        self._window_start = now()
+        self._window_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.latest) if self.policy == LATEST_PER_TAG else len(self.buffer)
+
+    def put(self, tag: str, data: Any = None) -> Optional[int]:
+        """Add (tag, data) to the buffer, and flush it if it's time to. Return the
+        message id, or None if the message was dropped straight away."""
+        msg_id = self.msg_index
+        self.msg_index += 1
+        if self.policy == LATEST_PER_TAG:
+            if tag in self.latest:
+                self.dropped += 1
+            elif len(self.latest) >= self.max_items:
+                del self.latest[next(iter(self.latest))]
+                self.dropped += 1
+            self.latest[tag] = (msg_id, data)
+        elif len(self.buffer) < self.max_items:
+            self.buffer.append((msg_id, tag, data))
+        elif self.policy == DROP_OLDEST:
+            self.buffer.popleft()
+            self.buffer.append((msg_id, tag, data))
+            self.dropped += 1
+        else:
+            self.dropped += 1
+            msg_id = None
+        if now() >= self.next_flush:
+            self.flush()
+        return msg_id
+
+    def _peek(self) -> Tuple[int, str, Any]:
+        if self.policy == LATEST_PER_TAG:
+            tag, (msg_id, data) = next(iter(self.latest.items()))
+            return msg_id, tag, data
+        return self.buffer[0]
+
+    def _pop(self):
+        if self.policy == LATEST_PER_TAG:
+            del self.latest[next(iter(self.latest))]
+        else:
+            self.buffer.popleft()
+
+    def _backed_up(self) -> bool:
+        """Whether the queue has no one to send to, or still hasn't sent what it was
+        last given."""
+        self.queue.flush()  # it only sends when something is put, so give it a chance
+        return not self.queue.connected or self.queue.pending() > 0
+
+    def flush(self, force: bool = False) -> bool:
+        """Send one batch from the buffer, if it's time to (or `force` is True) and
+        the queue has sent the last one. Return True if a batch was sent."""
+        time = now()
+        if not force and time < self.next_flush:
+            return False
+        sent = self._flush()
+        self.next_flush = time + 1 / self.rate
+        if time - self._window_start >= 1:
+            self.bytes_per_second = self._window_bytes / (time - self._window_start)
+            self._window_start, self._window_bytes = time, 0
+        return sent
+
+    def _flush(self) -> bool:
+        if not len(self):
+            self.rate = max(self.rate * 0.9, self.min_rate)
+            return False
+        if self._backed_up():
+            self.rate = max(self.rate / 2, self.min_rate)
+            return False
+        batch = bytearray()
+        count = 0
+        while len(self):
+            try:
+                frame = encode_frame(*self._peek(), self.codecs)
+            except Exception:  # no codec takes the data, or one failed on it
+                frame = b""
+            if not frame or len(frame) > self.max_batch_bytes:
+                self._pop()  # it can never be sent
+                self.dropped += 1
+                continue
+            if len(batch) + len(frame) > self.max_batch_bytes:
+                break
+            self._pop()
+            batch += frame
+            count += 1
+        if len(self):
+            self.rate = min(self.rate * 1.5, self.max_rate)
+        elif len(batch) < self.max_batch_bytes // 4:
+            self.rate = max(self.rate * 0.9, self.min_rate)
+        if not count:
+            return False
+        try:
+            self.queue.put(BATCH_TAG, bytes(batch))
+        except Exception:
+            self.dropped += count
+            return False
+        self.sent += count
+        self.batches += 1
+        self._window_bytes += len(batch)
+        return True
+
+    def stats(self) -> TelemetryStats:
+        return TelemetryStats(
+            len(self),
+            self.dropped,
+            self.sent,
+            self.batches,
+            self.bytes_per_second,
+            self.rate,
+        )
+
+
+def unpack(message: Optional[Message], codecs: List[Codec] = CODECS) -> List[Message]:
+    """The messages in a batch sent by `Telemetry`. Any other message is returned by
+    itself, and None gives an empty list. Messages with codecs that aren't in `codecs`
+    are left out."""
+    if message is None:
+        return []
+    if message.tag != BATCH_TAG:
+        return [message]
+    decoders = {codec.id: codec.decode for codec in codecs}
+    view = memoryview(message.data)
+    messages = []
+    position = 0
+    while position < len(view):
+        payload_length, msg_id, tag_length, codec_id = HEADER.unpack_from(
+            view, position
+        )
+        start = position + HEADER.size
+        position = start + tag_length + payload_length
+        decode = decoders.get(codec_id)
+        if decode is not None:
+            tag = bytes(view[start : start + tag_length]).decode()
+            messages.append(
+                Message(msg_id, tag, decode(view[start + tag_length : position]))
+            )
+    return messages
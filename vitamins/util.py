@@ -3,7 +3,6 @@ from time import perf_counter
 from platform import node
 from hashlib import md5
 
-
 DEV_HOST_HASHES = ["98718bd98a3e2a41f760bc8f28810190"]
 
 
@@ -31,6 +30,9 @@ except ImportError:
 
 
 class TickStats:
+    """Prints the running mean of a per-tick value every `interval` ticks. Superseded
+    by `vitamins.profiler.TickProfiler` for timing ticks."""
+
     def __init__(self, name: str, unit: str = "", interval=100, startup=0):
         self.name = name
         self.unit = unit